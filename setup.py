@@ -14,13 +14,15 @@ REQUIRES = [
     'auth0-python',
     'stringcase',
     'cerberus',
-    'crhelper'
+    'crhelper',
+    'requests',
 ]
 REQUIRES_TEST = [
     'PyYAML>=5.3.1',
     'pylint>=2.5.0',
     'pytest>=5.4.1',
     'pytest-cov>=2.8.1',
+    'pytest-benchmark>=3.2.3',
     'bandit>=1.6.2',
     'safety>=1.8.7',
     'paste',
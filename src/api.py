@@ -3,17 +3,16 @@ API CRUD handler
 """
 import logging
 
-import boto3
 from crhelper import CfnResource
 from auth0.v3.exceptions import Auth0Error
 
-from .utils import config
+from .utils import clients, config, diff
 from .lambdatype import LambdaDict, LambdaContext
 from .validation.api import auth0Validator
 
 logger = logging.getLogger('aws-auth0-cr')
 
-secrets_client = boto3.client('secretsmanager')
+secrets_client = clients.LazyClient('secretsmanager')
 
 
 def create(event: LambdaDict, _: LambdaContext, helper: CfnResource) -> str:
@@ -31,6 +30,21 @@ def create(event: LambdaDict, _: LambdaContext, helper: CfnResource) -> str:
     return api_id
 
 
+def old_api(event: LambdaDict):
+    """
+    Normalize the properties from before the update the same way as the new ones.
+    Returns None if they no longer validate, so the full payload gets sent.
+    """
+    if diff.tenant_changed(event):
+        return None
+    validated = auth0Validator.validated(event['OldResourceProperties'])
+    if not validated:
+        logger.info('old properties do not validate, sending every field: %s',
+                    auth0Validator.errors)
+        return None
+    return validated
+
+
 def update(event: LambdaDict, _: LambdaContext, helper: CfnResource) -> str:
     """
     Update an API
@@ -39,19 +53,29 @@ def update(event: LambdaDict, _: LambdaContext, helper: CfnResource) -> str:
     validated = auth0Validator.validated(props)
     if not validated:
         raise Exception(auth0Validator.errors)
-    provider = config.get_provider(props.get('Tenant'))
 
     api_id = event['PhysicalResourceId']
+    helper.Data['ApiId'] = api_id
+    helper.Data['Audience'] = props.get('Audience')
     # Handle audience change with creating a new resource
     if props['Audience'] != event['OldResourceProperties']['Audience']:
         logger.info('New audience, deleting old resource and creating a new one.')
-        api_id = provider.create_api(**validated)
+        provider = config.get_provider(props.get('Tenant'))
+        helper.Data['ApiId'] = provider.create_api(**validated)
         delete_handle_err(provider, event['PhysicalResourceId'])
-    else:
-        del validated['identifier']
-        provider.update_api(event['PhysicalResourceId'], **validated)
-    helper.Data['ApiId'] = api_id
-    helper.Data['Audience'] = props.get('Audience')
+        return event['PhysicalResourceId']
+
+    old = old_api(event)
+    changes = validated if old is None else diff.changed_fields(old, validated)
+    changes.pop('identifier', None)
+    if not changes:
+        # skip authenticating to auth0 at all
+        logger.info('API %s is unchanged', api_id)
+        return event['PhysicalResourceId']
+
+    logger.info('Updating %s of API %s', ', '.join(changes), api_id)
+    provider = config.get_provider(props.get('Tenant'))
+    provider.update_api(event['PhysicalResourceId'], **changes)
     return event['PhysicalResourceId']
 
 
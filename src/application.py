@@ -4,8 +4,8 @@ Application CRUD handler
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-import boto3
 import botocore
 from botocore.exceptions import ClientError
 from crhelper import CfnResource
@@ -13,7 +13,7 @@ import stringcase
 from auth0.v3.exceptions import Auth0Error
 
 from .lambdatype import LambdaContext, LambdaDict
-from .utils import config, secret
+from .utils import clients, config, diff, secret
 from .validation.application import (
     auth0Validator,
     tagsValidator,
@@ -21,8 +21,15 @@ from .validation.application import (
 
 logger = logging.getLogger('aws-auth0-cr')
 
-secrets_client = boto3.client('secretsmanager')
-ssm = boto3.client('ssm')
+secrets_client = clients.LazyClient('secretsmanager')
+ssm = clients.LazyClient('ssm')
+
+# Connections updated at the same time, auth0 calls are still rate limited per tenant
+CONNECTION_WORKERS = int(os.environ.get('CONNECTION_WORKERS', 5))
+
+
+class ConnectionsFailed(Exception):
+    """The application could not be added to or removed from some connections"""
 
 
 def create(event: LambdaDict, _: LambdaContext, helper: CfnResource) -> str:  # pylint: disable=too-many-locals
@@ -35,7 +42,8 @@ def create(event: LambdaDict, _: LambdaContext, helper: CfnResource) -> str:  #
         raise Exception(auth0Validator.errors)
 
     tags = tagsValidator.validated(helper.Data.get('tags', {}))
-    validated['client_metadata'].update(tags)
+    # copy, the client_metadata default is shared by every validated document
+    validated['client_metadata'] = {**validated['client_metadata'], **tags}
 
     provider = config.get_provider(props['Tenant'])
     client_id, client_secret = provider.create_application(
@@ -46,8 +54,10 @@ def create(event: LambdaDict, _: LambdaContext, helper: CfnResource) -> str:  #
     try:
         env = os.getenv('ENVIRON')
         # Enable the application for all the connections
-        for conn_id in props.get('Connections', []):
-            provider.add_to_connection(conn_id, client_id)
+        failed_add = manage_connection(
+            props.get('Connections', []), client_id, provider.add_to_connection)
+        if failed_add:
+            raise ConnectionsFailed(f'failed to add: {failed_add}')
 
         # Only do secretsmanager resource for m2m apps, use ssm for the rest
         if props.get('Type') != 'm2m':
@@ -95,18 +105,34 @@ def create(event: LambdaDict, _: LambdaContext, helper: CfnResource) -> str:  #
         raise err
 
 
-def manage_connection(connections, app_id, method):
-    """Manage adding or removing an application from a connection"""
+def connection_pool(size):
+    """Worker pool for size connection changes"""
+    return ThreadPoolExecutor(max_workers=max(1, min(CONNECTION_WORKERS, size)))
+
+
+def submit_connections(pool, connections, app_id, method):
+    """Start adding or removing an application from each connection"""
+    return [(conn_id, pool.submit(method, conn_id, app_id)) for conn_id in connections]
+
+
+def collect_failures(futures):
+    """Wait for connection changes and return the connections that failed"""
     failed = []
-    for conn_id in connections:
+    for conn_id, future in futures:
         try:
-            method(conn_id, app_id)
+            future.result()
         except Exception as err:  # pylint: disable=broad-except
-            print(err)
+            logger.error('connection %s failed: %s', conn_id, err)
             failed.append(conn_id)
     return failed
 
 
+def manage_connection(connections, app_id, method):
+    """Manage adding or removing an application from a connection"""
+    with connection_pool(len(connections)) as pool:
+        return collect_failures(submit_connections(pool, connections, app_id, method))
+
+
 def update_connections(old, current, provider, app_id):
     """
     Update the connections for the application
@@ -117,15 +143,60 @@ def update_connections(old, current, provider, app_id):
     add_connections = list(set(current) - set(old))
     remove_connections = list(set(old) - set(current))
 
-    failed_add = []
-    failed_delete = []
-
-    failed_add = manage_connection(add_connections, app_id, provider.add_to_connection)
-    failed_delete = manage_connection(remove_connections, app_id, provider.remove_from_connection)
+    # adds and removes share one pool so the whole sync takes about one round trip
+    with connection_pool(len(add_connections) + len(remove_connections)) as pool:
+        adding = submit_connections(
+            pool, add_connections, app_id, provider.add_to_connection)
+        removing = submit_connections(
+            pool, remove_connections, app_id, provider.remove_from_connection)
+        failed_add = collect_failures(adding)
+        failed_delete = collect_failures(removing)
 
     if failed_add or failed_delete:
-        raise Exception(
-            'failed to add: %s, failed to delete: %s' % (failed_add, failed_delete))
+        raise ConnectionsFailed(
+            f'failed to add: {failed_add}, failed to delete: {failed_delete}')
+
+
+def metadata_tags(helper: CfnResource, props: dict, stack_tags: bool = True) -> dict:
+    """
+    Tags kept in the client_metadata of an application with these properties.
+    The stack tags are the ones of the stack right now, AllowAdGroups comes
+    from the properties.
+
+    Args:
+        helper (CfnResource): helper with the stack tags in its Data
+        props (dict): resource properties
+        stack_tags (bool): include the stack tags, only AllowAdGroups otherwise
+    """
+    tags = {}
+    if stack_tags:
+        tags = {key: value for key, value in helper.Data.get('tags', {}).items()
+                if key != 'AllowAdGroups'}
+    if props.get('AllowAdGroups'):
+        tags['AllowAdGroups'] = props['AllowAdGroups']
+    return tagsValidator.validated(tags)
+
+
+def old_application(event: LambdaDict, helper: CfnResource):
+    """
+    Normalize the properties from before the update the same way as the new ones.
+    Returns None if they no longer validate, so the full payload gets sent.
+
+    The stack tags from before the update aren't known, only the current ones,
+    so they are left out. Any update of an application whose stack has tags
+    sends its client_metadata and a changed tag always reaches auth0.
+    """
+    old_props = event['OldResourceProperties']
+    if diff.tenant_changed(event):
+        return None
+    validated = auth0Validator.validated(old_props)
+    if not validated:
+        logger.info('old properties do not validate, sending every field: %s',
+                    auth0Validator.errors)
+        return None
+    validated['client_metadata'] = {
+        **validated['client_metadata'], **metadata_tags(helper, old_props, stack_tags=False)}
+    return validated
 
 
 def update(event: LambdaDict, context: LambdaContext, helper: CfnResource):  # pylint: disable=unused-argument
@@ -134,38 +205,46 @@ def update(event: LambdaDict, context: LambdaContext, helper: CfnResource):  # p
     validated = auth0Validator.validated(props)
     if not validated:
         raise Exception(auth0Validator.errors)
-    tags = tagsValidator.validated(helper.Data.get('tags', {}))
+    metadata = dict(validated['client_metadata'])
     if 'AllowAdGroups' in event['OldResourceProperties'] and 'AllowAdGroups' not in props:
-        validated['client_metadata'].update({'AllowAdGroups': None})
-    validated['client_metadata'].update(tags)
-    provider = config.get_provider(props['Tenant'])
+        metadata['AllowAdGroups'] = None
+    metadata.update(metadata_tags(helper, props))
+    validated['client_metadata'] = metadata
 
     if props.get('Type') != event['OldResourceProperties'].get('Type', None):
         raise Exception(
             'Changing Type is not supported. Create a new resource and remove the old one instead')
+
+    old = old_application(event, helper)
+    changes = validated if old is None else diff.changed_fields(old, validated)
+
     if props.get('Type') != 'm2m':
         app_id = event['PhysicalResourceId']
     else:
         # Get the secret for the client_id
-        resource = secret.get_muxed_secret(
-            secrets_client,
-            event['PhysicalResourceId'],
-            logger)
+        resource = secret.get_muxed_secret(secrets_client, event['PhysicalResourceId'])
         app_secret = json.loads(resource['SecretValue'])
         app_id = app_secret['client_id']
+        helper.Data['Arn'] = resource['ARN']
+        helper.Data['Name'] = event['PhysicalResourceId']
 
-    # Update the connections
     current = props.get('Connections', [])
-    old = event['OldResourceProperties'].get('Connections', [])
+    old_connections = event['OldResourceProperties'].get('Connections', [])
+
+    helper.Data['ClientId'] = app_id
+    if not changes and set(current) == set(old_connections):
+        # skip authenticating to auth0 at all
+        logger.info('Application %s is unchanged', app_id)
+        return event['PhysicalResourceId']
 
-    update_connections(old, current, provider, app_id)
+    provider = config.get_provider(props['Tenant'])
+    # Update the connections
+    update_connections(old_connections, current, provider, app_id)
 
     # Update the app in Auth0
-    client_id = provider.update_application(app_id, **validated)
-    helper.Data['ClientId'] = client_id
-    if props.get('Type') == 'm2m':
-        helper.Data['Arn'] = resource['ARN']
-        helper.Data['Name'] = event['PhysicalResourceId']
+    if changes:
+        logger.info('Updating %s of application %s', ', '.join(changes), app_id)
+        helper.Data['ClientId'] = provider.update_application(app_id, **changes)
 
     return event['PhysicalResourceId']
 
@@ -219,6 +298,7 @@ def delete(event: LambdaDict, context: LambdaContext, helper: CfnResource):  # p
             SecretId=event['PhysicalResourceId'],
             ForceDeleteWithoutRecovery=True
         )
+        secret.invalidate(event['PhysicalResourceId'])
     # Try deleting the client secret
     try:
         env = os.getenv('ENVIRON')
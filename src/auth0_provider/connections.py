@@ -0,0 +1,58 @@
+"""
+Connection membership updates
+
+A connection's enabled_clients can only be written as a whole list, so a
+change is a read of the list followed by a write of the merged list, and
+the write is skipped when the connection already has the change. Writes to
+the same connection from one container are serialized. Auth0 has no
+conditional update, so a write from another container landing between our
+read and write can still be overwritten.
+"""
+import logging
+import threading
+
+logger = logging.getLogger('aws-auth0-cr')
+
+
+def merge(enabled, changes):
+    """
+    Apply changes to a list of enabled clients, keeping the existing order
+
+    Args:
+        enabled (list): client ids enabled on the connection
+        changes (dict): client id to True to enable it or False to disable it
+    """
+    merged = [client for client in enabled if changes.get(client, True)]
+    merged.extend(
+        client for client, enable in changes.items() if enable and client not in enabled)
+    return merged
+
+
+class ConnectionMembers():  # pylint: disable=too-few-public-methods
+    """Read-modify-write of enabled_clients, one writer per connection at a time"""
+
+    def __init__(self):
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._writers = {}
+
+    def change(self, endpoint, conn_id, app_id, enable):
+        """
+        Enable or disable a client on a connection
+
+        Args:
+            endpoint (object): sdk connections endpoint
+            conn_id (str): id of the connection
+            app_id (str): client id to change
+            enable (bool): True to enable the client, False to disable it
+        """
+        with self._lock:
+            writer = self._writers.setdefault(conn_id, threading.Lock())
+        with writer:
+            enabled = endpoint.get(conn_id, ['enabled_clients'])['enabled_clients']
+            wanted = merge(enabled, {app_id: enable})
+            if wanted == enabled:
+                logger.debug('connection %s already has %s', conn_id, app_id)
+                return
+            endpoint.update(conn_id, {'enabled_clients': wanted})
+            self.writes += 1
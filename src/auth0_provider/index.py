@@ -1,20 +1,24 @@
 """Library of auth0 interactions"""
 import logging
 import json
-import time
-import boto3
+import threading
+from urllib.parse import quote
 from auth0.v3.authentication import GetToken
+from auth0.v3.exceptions import Auth0Error
 from auth0.v3.management import Auth0
-from src.utils import secret
+from src.utils import clients, secret
+from . import pagination, session
+from .connections import ConnectionMembers
+from .token import TOKENS
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Page limit for auth0 in case of run-away pagination
-PAGE_LIMIT = 60
+# Held while a provider authenticates again after a rejected token
+REAUTH_LOCK = threading.Lock()
 
 
-class Auth0Provider():
+class Auth0Provider():  # pylint: disable=too-many-public-methods
     """
     Generic Cloudformation custom resource provider for Auth0 resources.
     """
@@ -26,32 +30,72 @@ class Auth0Provider():
             management_secret (str): secrets manager location for the management api credentials
             tenant (str): Auth0 tenant, e.g. mmm-dev
         """
-        self.secrets_manager = boto3.client('secretsmanager')
-        admin = json.loads(secret.get_secret(
-            self.secrets_manager, management_secret, logger))
+        self.secrets_manager = clients.get_client('secretsmanager')
+        self.management_secret = management_secret
+        self.tenant = tenant
+        self.token = None
+        self.auth0 = None
+        self.members = ConnectionMembers()
+        # Called with the provider and a token auth0 rejected, returns a new token
+        self.on_unauthorized = None
+        self.refresh()
+
+    def refresh(self):
+        """Authenticate again with the management api credentials"""
+        admin = json.loads(secret.get_secret(self.secrets_manager, self.management_secret))
         self.authenticate(
-            tenant,
+            self.tenant,
             admin['AUTH0_CLIENT_ID'],
             admin['AUTH0_CLIENT_SECRET']
         )
 
+    def is_authenticated(self):
+        """Check the management api token is not about to expire"""
+        return TOKENS.is_fresh(self.token)
+
     def authenticate(self, tenant, client_id, client_secret):
         """Sets up an authenticated client
 
+        Tokens are cached per tenant and client for the lifetime of the container,
+        so only the first call in a warm container hits /oauth/token. All calls
+        go over the container's shared keep-alive session.
+
         Args:
             tenant (str): tenant name for auth0
             client_id (str): id of the application authorized to use the management api
             client_secret (str): client secret for the above application
         """
-        get_token = GetToken(tenant)
-        logger.info('Getting token for tenant %s with client %s', tenant, client_id)
-        token = get_token.client_credentials(
-            client_id, client_secret, 'https://{}/api/v2/'.format(tenant))
-        mgmt_api_token = token['access_token']
-
-        self.auth0 = Auth0(tenant, mgmt_api_token)
+        def fetch():
+            get_token = session.use_session(GetToken(tenant))
+            logger.info('Getting token for tenant %s with client %s', tenant, client_id)
+            return get_token.client_credentials(
+                client_id, client_secret, 'https://{}/api/v2/'.format(tenant))
+
+        self.token = TOKENS.get(tenant, client_id, fetch)
+        self.auth0 = session.use_sessions(
+            Auth0(tenant, self.token['access_token']),
+            self.token['access_token'],
+            self.unauthorized,
+        )
         return self.auth0
 
+    def unauthorized(self, rejected):
+        """
+        Get a new token after auth0 rejected one, e.g. because the management
+        client secret was rotated. Returns None when there is no handler.
+
+        Args:
+            rejected (str): the access token auth0 answered with a 401
+        """
+        if self.on_unauthorized is None:
+            return None
+        with REAUTH_LOCK:
+            if self.token and self.token['access_token'] != rejected:
+                # another call already authenticated again
+                return self.token['access_token']
+            logger.warning('management token rejected for tenant %s', self.tenant)
+            return self.on_unauthorized(self, rejected)  # pylint: disable=not-callable
+
     def create_application(self, **kwargs):
         """Create an Auth0 Application (Client)
 
@@ -125,51 +169,83 @@ class Auth0Provider():
     def get_resource_server(self, url):
         """Gets the id of a resource server based on the audience
 
+        The management api accepts the audience in place of the id, so this is
+        a single request. Falls back to scanning the resource servers if the
+        tenant rejects the audience as an id.
+
+        Args:
+            url (str): Url associated with the resource server
+        """
+        try:
+            return self.auth0.resource_servers.get(quote(url, safe=''))['id']
+        except Auth0Error as err:
+            if err.status_code == 404:
+                return None
+            logger.warning('Audience lookup for %s failed, scanning instead: %s', url, err)
+        return self.scan_resource_servers(url)
+
+    def scan_resource_servers(self, url):
+        """Gets the id of a resource server by paging through all of them
+
         Args:
             url (str): Url associated with the resource server
         """
-        page = 0
-        prev = []
-        while page is not None:
-            resource_list = self.auth0.resource_servers.get_all(
-                page=page, per_page=50)
-            # If there is only one page, get_all will return the same
-            # value for every page
-            if prev == resource_list:
-                break
-            prev = resource_list
-            if resource_list == []:
-                break
-            for resource in resource_list:
-                if resource['identifier'] == url:
-                    return resource['id']
-            page += 1
-            if page > PAGE_LIMIT:
-                break
-            time.sleep(1)
+        for resource in self.iter_resource_servers():
+            if resource['identifier'] == url:
+                return resource['id']
         return None
 
+    def iter_clients(self, fields=None, per_page=pagination.PER_PAGE, workers=1):
+        """Yield every application (client) in the tenant
+
+        Args:
+            fields (list): only request these fields of each client
+            per_page (int): clients requested at a time
+            workers (int): pages fetched concurrently once the total is known
+        """
+        return pagination.iterate(
+            self.auth0.clients, 'clients', fields, per_page, workers=workers)
+
+    def iter_resource_servers(self, per_page=pagination.PER_PAGE, workers=1):
+        """Yield every resource server (api) in the tenant
+
+        Args:
+            per_page (int): resource servers requested at a time
+            workers (int): pages fetched concurrently once the total is known
+        """
+        return pagination.iterate(
+            self.auth0.resource_servers, 'resource_servers', None, per_page, workers=workers)
+
+    def iter_client_grants(self, per_page=pagination.PER_PAGE):
+        """Yield every client grant in the tenant
+
+        Args:
+            per_page (int): grants requested at a time
+        """
+        return pagination.iterate(
+            self.auth0.client_grants, 'client_grants', None, per_page, checkpoint=True)
+
+    def iter_connections(self, fields=None, per_page=pagination.PER_PAGE):
+        """Yield every connection in the tenant
+
+        Args:
+            fields (list): only request these fields of each connection
+            per_page (int): connections requested at a time
+        """
+        return pagination.iterate(
+            self.auth0.connections, 'connections', fields, per_page, checkpoint=True)
+
     def get_application(self, client_id, fields=None, include_fields=True):
         """Get an application (client) from auth0 by id"""
         return self.auth0.clients.get(id=client_id, fields=fields, include_fields=include_fields)
 
     def add_to_connection(self, conn_id, app_id):
         """Enable a connection for an application"""
-        connection = self.auth0.connections.get(conn_id, ['enabled_clients'])
-        # add the app_id to the list of enabled_clients
-        if app_id not in connection['enabled_clients']:
-            connection['enabled_clients'].append(app_id)
-        # update the connection
-        self.auth0.connections.update(conn_id, {'enabled_clients': connection['enabled_clients']})
+        self.members.change(self.auth0.connections, conn_id, app_id, True)
 
     def remove_from_connection(self, conn_id, app_id):
         """Disable a connection for an application"""
-        connection = self.auth0.connections.get(conn_id, ['enabled_clients'])
-        # remove the app_id to the list of enabled_clients
-        if app_id in connection['enabled_clients']:
-            connection['enabled_clients'].remove(app_id)
-        # update the connection
-        self.auth0.connections.update(conn_id, {'enabled_clients': connection['enabled_clients']})
+        self.members.change(self.auth0.connections, conn_id, app_id, False)
 
     def update_application(self, client_id, **kwargs):
         """Update an Auth0 Application (Client)
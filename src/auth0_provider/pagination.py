@@ -0,0 +1,142 @@
+"""
+Streaming pagination over Auth0 management api list endpoints
+
+Records are yielded one page at a time so a scan never holds more than a
+single page of the tenant in memory. Endpoints that support checkpoint
+pagination (from/take) use it, everything else uses page numbers with
+include_totals so the last page is known without an extra request. Once
+the first page has told us the total, the remaining pages can optionally be
+fetched concurrently.
+"""
+import logging
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .session import POOL_SIZE
+
+logger = logging.getLogger('aws-auth0-cr')
+
+PER_PAGE = 50
+# Page limit for auth0 in case of run-away pagination
+PAGE_LIMIT = 60
+
+
+def _get(endpoint, params):
+    """Send a list request through the sdk endpoint's rest client"""
+    return endpoint.client.get(endpoint._url(), params=params)  # pylint: disable=protected-access
+
+
+def _fields(fields):
+    """Query parameters to only request some fields of each record"""
+    if not fields:
+        return {}
+    return {'fields': ','.join(fields), 'include_fields': 'true'}
+
+
+def iterate(endpoint, key, fields=None, per_page=PER_PAGE, *,  # pylint: disable=too-many-arguments
+            checkpoint=False, workers=1):
+    """Yield every record of a list endpoint
+
+    Args:
+        endpoint (object): sdk endpoint, e.g. auth0.clients
+        key (str): name of the list in the response body, e.g. clients
+        fields (list): only request these fields of each record
+        per_page (int): records requested at a time
+        checkpoint (bool): use checkpoint pagination if the endpoint supports it
+        workers (int): pages fetched at once in page number mode
+    """
+    if checkpoint:
+        try:
+            yield from iterate_checkpoint(endpoint, key, fields, per_page)
+            return
+        except CheckpointUnsupported:
+            logger.info('%s does not support checkpoint pagination, using pages', key)
+    if workers > 1:
+        yield from iterate_pages_concurrent(endpoint, key, fields, per_page, workers)
+        return
+    yield from iterate_pages(endpoint, key, fields, per_page)
+
+
+def iterate_checkpoint(endpoint, key, fields=None, per_page=PER_PAGE):
+    """
+    Yield every record using checkpoint (from/take) pagination. Raises
+    CheckpointUnsupported before yielding anything if the first response is
+    not a checkpoint page.
+    """
+    params = {'take': per_page, **_fields(fields)}
+    res = _get(endpoint, params)
+    if not isinstance(res, dict) or key not in res:
+        raise CheckpointUnsupported(key)
+    while True:
+        yield from res[key]
+        if not res.get('next') or not res[key]:
+            return
+        res = _get(endpoint, {**params, 'from': res['next']})
+
+
+def iterate_pages(endpoint, key, fields=None, per_page=PER_PAGE, start=0):
+    """Yield every record using page number pagination"""
+    page = start
+    seen = 0
+    while page < PAGE_LIMIT:
+        res = _get(endpoint, page_params(page, per_page, fields))
+        records = res.get(key, [])
+        yield from records
+        seen += len(records)
+        if not records or len(records) < per_page or seen >= res.get('total', seen + 1):
+            return
+        page += 1
+    logger.warning('stopped listing %s after %d pages', key, PAGE_LIMIT)
+
+
+def iterate_pages_concurrent(endpoint, key, fields=None, per_page=PER_PAGE, workers=4):
+    """
+    Yield every record using page number pagination, fetching the pages after
+    the first one on a thread pool. Records are yielded in page order and at
+    most two pages per worker are held in memory. Every request still goes
+    through the tenant's rate limiter, so the pool only speeds things up while
+    there is budget left in the window.
+    """
+    first = _get(endpoint, page_params(0, per_page, fields))
+    records = first.get(key, [])
+    yield from records
+    if len(records) < per_page:
+        return
+    if 'total' not in first:
+        # without a total the page count is unknown, carry on one at a time
+        yield from iterate_pages(endpoint, key, fields, per_page, start=1)
+        return
+    pages = math.ceil(first['total'] / per_page)
+    if pages > PAGE_LIMIT:
+        logger.warning('only listing the first %d pages of %s', PAGE_LIMIT, key)
+        pages = PAGE_LIMIT
+    workers = min(workers, POOL_SIZE)
+    pending = deque()
+    page = 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            while page < pages or pending:
+                while page < pages and len(pending) < 2 * workers:
+                    pending.append(
+                        pool.submit(_get, endpoint, page_params(page, per_page, fields)))
+                    page += 1
+                yield from pending.popleft().result().get(key, [])
+        finally:
+            # the caller stopped early, don't fetch pages nobody will read
+            for future in pending:
+                future.cancel()
+
+
+def page_params(page, per_page, fields=None):
+    """Query parameters for a single page"""
+    return {
+        'page': page,
+        'per_page': per_page,
+        'include_totals': 'true',
+        **_fields(fields),
+    }
+
+
+class CheckpointUnsupported(Exception):
+    """The endpoint did not answer with a checkpoint paginated response"""
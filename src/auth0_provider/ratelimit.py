@@ -0,0 +1,102 @@
+"""
+Rate limit aware throttling for the Auth0 management api
+
+Auth0 reports the remaining request budget of the current window in the
+x-ratelimit-limit, x-ratelimit-remaining and x-ratelimit-reset headers of
+every response. Requests go out at full speed while budget remains, are
+spread over the rest of the window as the budget runs low, and wait for
+the window to reset once it is exhausted or a 429 comes back.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger('aws-auth0-cr')
+
+# Start spreading requests out when this many are left in the window
+RESERVE = 5
+# Never sleep longer than this before a single request
+MAX_WAIT = 10
+
+
+def _header(headers, name):
+    """Read a numeric rate limit header, None if missing or malformed"""
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class RateLimiter():
+    """Token bucket for a single tenant, refilled from the response headers"""
+
+    def __init__(self, reserve=RESERVE, max_wait=MAX_WAIT):
+        """Default constructor
+
+        Args:
+            reserve (int): remaining requests at which to start slowing down
+            max_wait (float): longest sleep before a single request
+        """
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def delay(self, now=None):
+        """Take a request from the bucket and return how long to wait before sending it"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.reset_at <= now:
+                # the window has reset since the last response
+                self.remaining = self.limit
+            if self.remaining is None:
+                return 0
+            window = self.reset_at - now
+            remaining = self.remaining
+            self.remaining -= 1
+        if remaining > self.reserve:
+            return 0
+        if remaining <= 0:
+            return min(window, self.max_wait)
+        # spread what is left evenly over the rest of the window
+        return min(window / (remaining + 1), self.max_wait)
+
+    def acquire(self):
+        """Wait, if needed, before sending a request"""
+        wait = self.delay()
+        if wait > 0:
+            self.throttled += 1
+            logger.info('throttling auth0 request for %.2fs', wait)
+            time.sleep(wait)
+
+    def update(self, status_code, headers):
+        """Refill the bucket from a response"""
+        limit = _header(headers, 'x-ratelimit-limit')
+        remaining = _header(headers, 'x-ratelimit-remaining')
+        reset_at = _header(headers, 'x-ratelimit-reset')
+        with self._lock:
+            if limit is not None:
+                self.limit = limit
+            if remaining is not None:
+                self.remaining = remaining
+            if reset_at is not None:
+                self.reset_at = reset_at
+            if status_code == 429:
+                self.remaining = 0
+                if reset_at is None:
+                    self.reset_at = time.time() + 1
+
+
+LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(domain):
+    """Get the rate limiter for a tenant domain"""
+    with _LIMITERS_LOCK:
+        if domain not in LIMITERS:
+            LIMITERS[domain] = RateLimiter()
+        return LIMITERS[domain]
@@ -0,0 +1,171 @@
+"""
+Pooled keep-alive HTTP session shared by every Auth0 call in a container
+
+The auth0 sdk sends each request with the module level requests functions,
+which opens a new TLS connection to the tenant every time. The clients
+built here send everything over one requests.Session instead.
+"""
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from auth0.v3.rest import RestClient, RestClientOptions
+from auth0.v3.management.auth0 import modules
+from src.utils.retry import RetryPolicy
+from .ratelimit import get_limiter
+
+# Connections kept open per host
+POOL_SIZE = int(os.environ.get('AUTH0_POOL_SIZE', 10))
+CONNECT_TIMEOUT = float(os.environ.get('AUTH0_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.environ.get('AUTH0_READ_TIMEOUT', 10))
+
+# Every auth0 call is retried on 429s and transient errors with this policy
+RETRY = RetryPolicy(
+    max_attempts=int(os.environ.get('AUTH0_MAX_ATTEMPTS', 4)),
+    max_elapsed=float(os.environ.get('AUTH0_MAX_RETRY_SECONDS', 10)),
+)
+# Methods that are safe to send again after a server error
+IDEMPOTENT = ('GET', 'PUT', 'PATCH', 'DELETE')
+TRANSIENT = (500, 502, 503, 504)
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_session():
+    """Get the container wide session, creating it on first use"""
+    global _SESSION  # pylint: disable=global-statement
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _SESSION = session
+        return _SESSION
+
+
+def rest_options():
+    """
+    Options for every auth0 rest client, with the configured timeouts.
+    Retries are left to RETRY instead of the sdk.
+    """
+    return RestClientOptions(timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=0)
+
+
+def wait_hint(headers):
+    """Seconds to wait according to Retry-After or x-ratelimit-reset, 0 if neither is set"""
+    try:
+        return max(0, float(headers['retry-after']))
+    except (KeyError, TypeError, ValueError):
+        pass
+    try:
+        return max(0, int(headers['x-ratelimit-reset']) - time.time())
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+def retry_after(method):
+    """Build the retry decision for requests of an http method"""
+    def decide(response, error):
+        if error is not None:
+            # A connect timeout never reached auth0, so even a POST can be resent
+            if isinstance(error, requests.ConnectTimeout):
+                return 0
+            if method in IDEMPOTENT and isinstance(error, requests.RequestException):
+                return 0
+            return None
+        if response.status_code == 429:
+            return wait_hint(response.headers)
+        if method in IDEMPOTENT and response.status_code in TRANSIENT:
+            return wait_hint(response.headers)
+        return None
+    return decide
+
+
+class SessionRestClient(RestClient):
+    """
+    RestClient that sends its requests over the shared session. When auth0
+    rejects the token, unauthorized is called with it and the request is
+    sent once more with the token it returns.
+    """
+
+    def __init__(self, jwt, options=None, unauthorized=None):
+        super().__init__(jwt, options=options)
+        self.unauthorized = unauthorized
+
+    def request(self, method, url, headers=None, **kwargs):
+        """
+        Send a request over the shared session and return the raw response.
+        Requests are throttled by the tenant's rate limit headers.
+        """
+        request_headers = self.base_headers.copy()
+        request_headers.update(headers or {})
+        limiter = get_limiter(urlparse(url).netloc)
+        limiter.acquire()
+        response = get_session().request(
+            method, url, headers=request_headers, timeout=self.options.timeout, **kwargs)
+        limiter.update(response.status_code, response.headers)
+        return response
+
+    def send(self, method, url, headers=None, **kwargs):
+        """Send a request with the retry policy and process the response"""
+        path = urlparse(url).path
+
+        def attempt():
+            return RETRY.call(
+                lambda: self.request(method, url, headers, **kwargs),
+                retry_after(method),
+                name=f'auth0 {method} {path}',
+            )
+
+        response = attempt()
+        if response.status_code == 401 and self.unauthorized is not None:
+            token = self.unauthorized(self.jwt)
+            if token:
+                self.jwt = token
+                self.base_headers['Authorization'] = f'Bearer {token}'
+                response = attempt()
+        return self._process_response(response)
+
+    def get(self, url, params=None, headers=None):
+        return self.send('GET', url, headers, params=params)
+
+    def post(self, url, data=None, headers=None):
+        return self.send('POST', url, headers, json=data)
+
+    def file_post(self, url, data=None, files=None):
+        headers = {'Content-Type': None}
+        return self.send('POST', url, headers, data=data, files=files)
+
+    def patch(self, url, data=None):
+        return self.send('PATCH', url, json=data)
+
+    def put(self, url, data=None):
+        return self.send('PUT', url, json=data)
+
+    def delete(self, url, params=None, data=None):
+        return self.send('DELETE', url, params=params or {}, json=data)
+
+
+def use_session(endpoint, token=None, unauthorized=None):
+    """Point an sdk endpoint object at the shared session with the configured timeouts"""
+    endpoint.client = SessionRestClient(token, rest_options(), unauthorized)
+    return endpoint
+
+
+def use_sessions(auth0, token, unauthorized=None):
+    """
+    Point every endpoint of a management api client at the shared session
+
+    Args:
+        auth0 (Auth0): management api client
+        token (str): management api token
+        unauthorized (callable): called with a rejected token, returns a new one or None
+    """
+    for name in modules:
+        use_session(getattr(auth0, name), token, unauthorized)
+    return auth0
@@ -0,0 +1,252 @@
+"""
+Shared stores for Auth0 management api tokens
+
+A store lets lambda containers share one management token instead of
+each cold container minting its own, which keeps large deploys under
+the tenant's machine to machine token quota.
+"""
+import abc
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from botocore.exceptions import ClientError
+from src.utils import clients
+
+logger = logging.getLogger('aws-auth0-cr')
+
+# Seconds a refresh lock is held before other containers treat it as abandoned
+LOCK_TTL = 30
+
+
+class TokenStore(abc.ABC):
+    """
+    Interface for a shared token store. Tokens are dicts with an access_token
+    and an expires_at epoch timestamp.
+    """
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Get the stored token for key, or None"""
+
+    @abc.abstractmethod
+    def put(self, key, token):
+        """Store the token for key"""
+
+    @abc.abstractmethod
+    def acquire(self, key, ttl=LOCK_TTL):
+        """Take the refresh lock for key. Returns False if someone else holds it"""
+
+    @abc.abstractmethod
+    def release(self, key):
+        """Release the refresh lock for key"""
+
+
+class MemoryTokenStore(TokenStore):
+    """Token store held in process memory, for tests"""
+
+    def __init__(self):
+        self.tokens = {}
+        self.locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.tokens.get(key)
+
+    def put(self, key, token):
+        self.tokens[key] = token
+
+    def acquire(self, key, ttl=LOCK_TTL):
+        with self._lock:
+            if self.locks.get(key, 0) > time.time():
+                return False
+            self.locks[key] = time.time() + ttl
+            return True
+
+    def release(self, key):
+        self.locks.pop(key, None)
+
+
+class FileTokenStore(TokenStore):
+    """
+    Token store backed by json files in a directory. Only shared between
+    processes on the same host, so it is meant for local runs and tests.
+    Tokens are management api credentials, files are only readable by
+    their owner.
+
+    A lock file holds its expiry and the thread that took it. Taking over
+    an expired lock and releasing one happen under an flock on a guard
+    file, so two processes never both replace the same expired lock.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.environ.get(
+            'TOKEN_STORE_PATH', os.path.join(tempfile.gettempdir(), 'auth0-tokens'))
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def _path(self, key, suffix='json'):
+        name = key.replace('/', '_')
+        return os.path.join(self.directory, f'{name}.{suffix}')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as token_file:
+                return json.load(token_file)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, token):
+        self._write(self._path(key), json.dumps(token))
+
+    @staticmethod
+    def _write(path, text):
+        """Write a private file then rename it so readers never see a partial file"""
+        temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        handle = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8') as temp_file:
+                temp_file.write(text)
+            os.replace(temp, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp)
+            raise
+
+    @staticmethod
+    def _owner():
+        return f'{os.getpid()}.{threading.get_ident()}'
+
+    @staticmethod
+    def _held(path):
+        """Expiry and owner of a lock file, None when there is no lock"""
+        try:
+            with open(path, encoding='utf-8') as lock_file:
+                expires, _, owner = lock_file.read().partition(' ')
+            return float(expires or 0), owner
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            return 0, ''
+
+    @contextlib.contextmanager
+    def _guard(self, key):
+        """Exclusive flock shared by every process using the directory"""
+        handle = os.open(self._path(key, 'guard'), os.O_CREAT | os.O_WRONLY, 0o600)
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(handle)
+
+    def _create(self, path, text):
+        try:
+            lock = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+        except FileExistsError:
+            return False
+        with os.fdopen(lock, 'w') as lock_file:
+            lock_file.write(text)
+        return True
+
+    def acquire(self, key, ttl=LOCK_TTL):
+        path = self._path(key, 'lock')
+        text = f'{time.time() + ttl} {self._owner()}'
+        if self._create(path, text):
+            return True
+        with self._guard(key):
+            held = self._held(path)
+            if held is None:
+                # released in the meantime, race the other writers for it
+                return self._create(path, text)
+            if held[0] >= time.time():
+                return False
+            # Expired, nobody else can take it over while we hold the guard
+            self._write(path, text)
+            return True
+
+    def release(self, key):
+        path = self._path(key, 'lock')
+        with self._guard(key):
+            held = self._held(path)
+            if held is not None and held[1] == self._owner():
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+
+
+class SSMTokenStore(TokenStore):
+    """
+    Token store backed by SSM parameter store SecureString parameters.
+
+    The refresh lock is a second parameter created with Overwrite=False,
+    which SSM rejects if the parameter already exists. An expired lock is
+    taken over by overwriting the version that was read, every write bumps
+    the version so only one container's overwrite lands on the next one.
+    """
+
+    def __init__(self, prefix=None, client=None):
+        env = os.environ.get('ENVIRON')
+        self.prefix = prefix or f'/{env}/auth0/tokens'
+        self.client = client or clients.get_client('ssm')
+
+    def _name(self, key, suffix=''):
+        return f'{self.prefix}/{key}{suffix}'
+
+    def get(self, key):
+        try:
+            res = self.client.get_parameter(Name=self._name(key), WithDecryption=True)
+        except ClientError as err:
+            if err.response['Error']['Code'] == 'ParameterNotFound':
+                return None
+            raise
+        return json.loads(res['Parameter']['Value'])
+
+    def put(self, key, token):
+        self.client.put_parameter(
+            Name=self._name(key),
+            Value=json.dumps(token),
+            Type='SecureString',
+            Overwrite=True,
+            # management tokens can be larger than a standard parameter allows
+            Tier='Intelligent-Tiering',
+        )
+
+    def acquire(self, key, ttl=LOCK_TTL):
+        name = self._name(key, '-lock')
+        expires = str(time.time() + ttl)
+        try:
+            self.client.put_parameter(Name=name, Value=expires, Type='String', Overwrite=False)
+            return True
+        except ClientError as err:
+            if err.response['Error']['Code'] != 'ParameterAlreadyExists':
+                raise
+        # Break locks left behind by a container that died mid refresh
+        try:
+            held = self.client.get_parameter(Name=name)['Parameter']
+        except ClientError as err:
+            if err.response['Error']['Code'] == 'ParameterNotFound':
+                # released in the meantime, try again on the next attempt
+                return False
+            raise
+        if float(held['Value']) > time.time():
+            return False
+        res = self.client.put_parameter(Name=name, Value=expires, Type='String', Overwrite=True)
+        # another container took it over between our read and write
+        return res['Version'] == held['Version'] + 1
+
+    def release(self, key):
+        try:
+            self.client.delete_parameter(Name=self._name(key, '-lock'))
+        except ClientError as err:
+            if err.response['Error']['Code'] != 'ParameterNotFound':
+                raise
+
+
+TOKEN_STORES = {
+    'memory': MemoryTokenStore,
+    'file': FileTokenStore,
+    'ssm': SSMTokenStore,
+}
@@ -0,0 +1,199 @@
+"""Cache of Auth0 management api tokens shared across warm invocations"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger('aws-auth0-cr')
+
+# Refresh a token this many seconds before it actually expires so a
+# token never runs out in the middle of a handler
+EXPIRY_MARGIN = 300
+
+# How long to wait for another container to finish refreshing a shared token
+REFRESH_WAIT = 5
+REFRESH_POLL = 0.5
+
+
+class TokenCache():  # pylint: disable=too-many-instance-attributes
+    """
+    In-process cache of management api tokens keyed by tenant and
+    management client id. Lives at module level so it survives between
+    invocations of a warm lambda container.
+
+    When a shared store is set, misses are read from the store first and
+    only one container at a time refreshes a stale token. Within a container
+    only the threads waiting on the same token are held up by a refresh.
+    """
+
+    def __init__(self, margin=EXPIRY_MARGIN, store=None):
+        """Default constructor
+
+        Args:
+            margin (int): seconds before expiry a token is considered stale
+            store (TokenStore): optional store shared between containers
+        """
+        self.margin = margin
+        self.store = store
+        self.tokens = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        # access tokens auth0 rejected, never served again even from the store
+        self.rejected = set()
+        # one lock per tenant and client, held while its token is refreshed
+        self._refreshing = {}
+        self._lock = threading.Lock()
+
+    def is_fresh(self, token, now=None):
+        """Check if a cached token can still be used
+
+        Args:
+            token (dict): cached token with an expires_at epoch timestamp
+            now (float): current time, defaults to time.time()
+        """
+        now = time.time() if now is None else now
+        return token['expires_at'] - self.margin > now and not self.is_rejected(token)
+
+    def is_rejected(self, token):
+        """Check if auth0 rejected a token before it expired"""
+        return token['access_token'] in self.rejected
+
+    def reject(self, tenant, access_token):
+        """
+        Drop the cached tokens of a tenant after auth0 rejected one of them,
+        e.g. because its management client secret was rotated
+
+        Args:
+            tenant (str): Auth0 tenant, e.g. my-tenant.auth0.com
+            access_token (str): the token auth0 answered with a 401
+        """
+        with self._lock:
+            self.rejected.add(access_token)
+        self.invalidate(tenant)
+
+    def get(self, tenant, client_id, fetch):
+        """Get a token for the tenant and client, fetching a new one when needed
+
+        Args:
+            tenant (str): Auth0 tenant, e.g. my-tenant.auth0.com
+            client_id (str): id of the application authorized to use the management api
+            fetch (callable): returns a client_credentials token response
+        Returns:
+            dict: access_token and the expires_at epoch timestamp
+        """
+        key = (tenant, client_id)
+        # hits only read the dict, a refresh of any token doesn't hold them up
+        token = self.tokens.get(key)
+        if token and self.is_fresh(token):
+            self.hits += 1
+            self.log('hit', tenant)
+            return token
+        with self.refresh_lock(key):
+            # another thread may have refreshed it while we waited
+            token = self.tokens.get(key)
+            if token and self.is_fresh(token):
+                self.hits += 1
+                self.log('hit', tenant)
+                return token
+            self.misses += 1
+            self.log('miss', tenant)
+            if self.store is None:
+                return self.put(tenant, client_id, fetch())
+            return self.get_shared(tenant, client_id, fetch)
+
+    def refresh_lock(self, key):
+        """Lock held while the token of a tenant and client is refreshed"""
+        with self._lock:
+            return self._refreshing.setdefault(key, threading.Lock())
+
+    def get_shared(self, tenant, client_id, fetch):
+        """Get a token through the shared store with single-flight refresh
+
+        Args:
+            tenant (str): Auth0 tenant, e.g. my-tenant.auth0.com
+            client_id (str): id of the application authorized to use the management api
+            fetch (callable): returns a client_credentials token response
+        """
+        key = f'{tenant}/{client_id}'
+        stored = self.call_store('get', key)
+        if stored and self.is_fresh(stored):
+            self.shared_hits += 1
+            self.log('shared hit', tenant)
+            self.tokens[(tenant, client_id)] = stored
+            return stored
+
+        # If the store cannot be reached, refresh as if we held the lock
+        if self.call_store('acquire', key, default=True):
+            try:
+                token = self.put(tenant, client_id, fetch())
+                self.call_store('put', key, token)
+                return token
+            finally:
+                self.call_store('release', key)
+
+        # Someone else is refreshing. A stale token that has not expired yet
+        # is still good for this invocation, otherwise wait for the new one.
+        if stored and stored['expires_at'] > time.time() and not self.is_rejected(stored):
+            self.tokens[(tenant, client_id)] = stored
+            return stored
+        deadline = time.time() + REFRESH_WAIT
+        while time.time() < deadline:
+            time.sleep(REFRESH_POLL)
+            stored = self.call_store('get', key)
+            if stored and self.is_fresh(stored):
+                self.shared_hits += 1
+                self.tokens[(tenant, client_id)] = stored
+                return stored
+        logger.warning('timed out waiting for shared token refresh for %s', tenant)
+        return self.put(tenant, client_id, fetch())
+
+    def call_store(self, method, *args, default=None):
+        """
+        Call a method on the shared store. The store is an optimization,
+        so failures are logged and the default is returned instead.
+        """
+        try:
+            return getattr(self.store, method)(*args)
+        except Exception as err:  # pylint: disable=broad-except
+            logger.warning('shared token store %s failed: %s', method, err)
+            return default
+
+    def put(self, tenant, client_id, response):
+        """Store a client_credentials token response
+
+        Args:
+            tenant (str): Auth0 tenant, e.g. my-tenant.auth0.com
+            client_id (str): id of the application authorized to use the management api
+            response (dict): response from the /oauth/token endpoint
+        """
+        token = {
+            'access_token': response['access_token'],
+            # Without an expires_in there is no way to tell when the token is
+            # stale, so it expires right away and is never served from cache
+            'expires_at': time.time() + int(response.get('expires_in', 0)),
+        }
+        self.tokens[(tenant, client_id)] = token
+        return token
+
+    def invalidate(self, tenant=None):
+        """Drop cached tokens, for a single tenant or all of them"""
+        with self._lock:
+            for key in [x for x in self.tokens if tenant is None or x[0] == tenant]:
+                self.tokens.pop(key)
+
+    def clear(self):
+        """Drop every cached token and reset the counters"""
+        self.invalidate()
+        self.rejected.clear()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+
+    def log(self, result, tenant):
+        """Log a cache lookup with the running counters"""
+        logger.info(
+            'management token cache %s for %s (hits=%d, misses=%d, shared_hits=%d)',
+            result, tenant, self.hits, self.misses, self.shared_hits)
+
+
+TOKENS = TokenCache()
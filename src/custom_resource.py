@@ -4,30 +4,34 @@ under the platform level visible to the user, and create apps for them.
 
 Using this repo as reference arch: https://github.com/binxio/cfn-auth0-provider
 """
+import importlib
 import logging
+import os
 from typing import Any
-import boto3
 from crhelper import CfnResource
 from .lambdatype import LambdaDict, LambdaContext
-from .utils import config
-from . import application, api, grant
+from .utils import clients, config, polling, retry, stack_events
 
 logger = logging.getLogger('aws-auth0-cr')
 
 # Setup the client
-secrets_client = boto3.client('secretsmanager')
+cfn = clients.LazyClient('cloudformation')
 helper = CfnResource(
     json_logging=False,
     log_level='DEBUG',
     boto_level='CRITICAL',
-    sleep_on_delete=120,
-    polling_interval=2,
+    sleep_on_delete=0,
+    polling_interval=polling.FIRST_INTERVAL,
 )
+# Seconds a delete waits before answering when it comes from the stack of this
+# function, so its logs are delivered before cloudformation deletes it
+DELETE_WAIT = int(os.environ.get('DELETE_WAIT_SECONDS', 120))
 
+# Resource modules are imported on first use, an event only ever needs one of them
 RESOURCES = {
-    'Authn_Application': application,
-    'Authn_Api': api,
-    'Authn_Grant': grant,
+    'Authn_Application': '.application',
+    'Authn_Api': '.api',
+    'Authn_Grant': '.grant',
 }
 
 
@@ -46,7 +50,7 @@ def get_resource(event: LambdaDict) -> Any:
             )
         )
 
-    return RESOURCES[resource_type]
+    return importlib.import_module(RESOURCES[resource_type], __package__)
 
 
 @helper.create
@@ -83,35 +87,95 @@ def delete(event: LambdaDict, context: LambdaContext):
 
 
 def poll_create(event: LambdaDict, context: LambdaContext):
-    """poll create sets a delay in response for the create"""
+    """
+    poll create sets a delay in response for the create, until the rest of
+    the deploy is done or the resource has waited long enough
+    """
     logger.info('POLL CREATE')
     logger.debug('poll event %s\ncontext: %s', event, context)
+    data = event['CrHelperData']
+    done = True
     try:
-        client = boto3.client('cloudformation')
-        events = client.describe_stack_events(
-            StackName=event['StackId'],
-            NextToken=event['RequestId'],
-        )
-        if stack_is_failing(events):
+        events = stack_events.scan_new(cfn, event['StackId'], data)
+        state = stack_events.analyse(events, complete=True)
+        if failing(state):
             logger.warning('Stack is in failing state, tearing down resource')
-            event['PhysicalResourceId'] = event['CrHelperData']['PhysicalResourceId']
+            event['PhysicalResourceId'] = data['PhysicalResourceId']
             delete(event, context)
+        else:
+            stack_name = event['StackId'].split('/')[1]
+            siblings = polling.siblings_in_progress(
+                data, state, [event['LogicalResourceId'], stack_name])
+            done = not siblings or not reschedule(event, data)
+            if not done:
+                logger.info('Waiting on %s', ', '.join(siblings))
     except Exception as err: # pylint: disable=broad-except
         logger.error(err)
 
-    return event['CrHelperData']['PhysicalResourceId']
+    return finish_poll(context, data['PhysicalResourceId'], done)
+
+
+def reschedule(event: LambdaDict, data) -> bool:
+    """
+    Back off the poll schedule. Returns False when the create has waited
+    long enough and should be answered now.
+    """
+    previous = data.get(polling.INTERVAL, polling.FIRST_INTERVAL)
+    interval = polling.schedule(data)
+    if interval is None:
+        return False
+    if interval != previous:
+        helper._events_client.put_rule(  # pylint: disable=protected-access
+            Name=event['CrHelperRule'].split('/')[1],
+            ScheduleExpression=polling.rate(interval),
+            State='ENABLED',
+        )
+    return True
+
+
+def finish_poll(context: LambdaContext, physical_id, done=True):
+    """
+    End a poll. A done poll returns the physical id, which completes the
+    create. Otherwise the poll data, with the stack event cursor, is saved
+    for the next poll, and the create completes anyway if that fails.
+    """
+    if not done:
+        try:
+            helper._put_targets(context.function_name)  # pylint: disable=protected-access
+            return None
+        except Exception as err:  # pylint: disable=broad-except
+            logger.warning('Could not schedule the next poll, answering now: %s', err)
+    # poll data is sent back as the resource's attributes
+    for key in polling.KEYS:
+        helper.Data.pop(key, None)
+    return physical_id
+
+
+def failing(state: stack_events.StackState) -> bool:
+    """log the failures of a deploy and return whether it is failing"""
+    for failure in state.failures:
+        logger.info(
+            '%s is %s: %s', failure['LogicalResourceId'], failure['ResourceStatus'],
+            failure.get('ResourceStatusReason'))
+    return state.failing
+
 
 def stack_is_failing(events):
-    """iterate stack events, determine if resource creation failed"""
-    failed = False
-    failure_modes = ('CREATE_FAILED', 'UPDATE_ROLLBACK_IN_PROGRESS')
-    for event in events['StackEvents']:
-        if event['ResourceStatus'] in failure_modes:
-            failed = True
-        if event.get('ResourceStatusReason') == "User Initiated":
-            break
-    return failed
+    """determine from stack events, newest first, if the current deploy failed"""
+    return failing(stack_events.analyse(events['StackEvents']))
+
 
+def delete_wait(event: LambdaDict) -> int:
+    """
+    Seconds to wait before answering a delete. Only the stack this function
+    is deployed in, FUNCTION_STACK_ID, can delete it along with its logs,
+    deletes from every other stack are answered straight away.
+    """
+    if event['RequestType'] != 'Delete':
+        return 0
+    if event['StackId'] != os.environ.get('FUNCTION_STACK_ID'):
+        return 0
+    return DELETE_WAIT
 
 
 def lambda_handler(event: LambdaDict, context: LambdaContext):
@@ -119,7 +183,9 @@ def lambda_handler(event: LambdaDict, context: LambdaContext):
     # Set up logging based on the LOGGING_LEVEL environment variable
     logger.debug('Event: %s', event)
     logger.debug('Context: %s', context)
+    retry.set_deadline(context)
     # Manually enable polling for create if the resource type not grant
     if event['RequestType'] == 'Create' and 'Authn_Grant' not in event['ResourceType']:
         helper._poll_create_func = poll_create # pylint: disable=protected-access
+    helper._sleep_on_delete = delete_wait(event) # pylint: disable=protected-access
     helper(event, context)
@@ -3,17 +3,16 @@ Grant CRUD handler
 """
 import logging
 
-import boto3
 from crhelper import CfnResource
 from auth0.v3.exceptions import Auth0Error
 
-from .utils import config
+from .utils import clients, config
 from .lambdatype import LambdaDict, LambdaContext
 from .validation.grant import auth0Validator
 
 logger = logging.getLogger('aws-auth0-cr')
 
-secrets_client = boto3.client('secretsmanager')
+secrets_client = clients.LazyClient('secretsmanager')
 
 
 def create(event: LambdaDict, _: LambdaContext, helper: CfnResource) -> str:
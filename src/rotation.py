@@ -2,14 +2,13 @@
 
 import logging
 import json
-import boto3
 import botocore
-from .utils import config, secret
+from .utils import clients, config, retry, secret
 
 logger = logging.getLogger('aws-auth0-cr')
 
 # Setup the client
-client = boto3.client('secretsmanager')
+client = clients.LazyClient('secretsmanager')
 
 
 def lambda_handler(event, context):
@@ -28,6 +27,7 @@ def lambda_handler(event, context):
     """
     logger.debug(event)
     logger.debug(context)
+    retry.set_deadline(context)
 
     arn = event['SecretId']
     token = event['ClientRequestToken']
@@ -57,7 +57,7 @@ def lambda_handler(event, context):
             "Secret version %s not set as AWSPENDING for rotation of secret %s." % (token, arn))
 
     # Get the tenant from the secret string
-    secret_contents = json.loads(secret.get_secret(client, arn, logger))
+    secret_contents = json.loads(secret.get_secret(client, arn))
     tenant = secret_contents['tenant']
 
     logger.info('tenant %s', tenant)
@@ -75,6 +75,8 @@ def lambda_handler(event, context):
 
     elif step == "finishSecret":
         finish_secret(client, arn, token)
+        # the pooled provider may hold a token of the rotated client
+        config.evict_provider(tenant)
 
     else:
         raise ValueError("Invalid step parameter")
@@ -88,8 +90,7 @@ def create_secret(secrets_client, provider, secret_id, token):
     """
     logger.info('create secret %s', secret_id)
     # Get the secret contents
-    secret_val = json.loads(secret.get_secret(
-        secrets_client, secret_id, logger))
+    secret_val = json.loads(secret.get_secret(secrets_client, secret_id))
     # Rotate the secret
     new_client_secret = provider.rotate_client_secret(
         client_id=secret_val['client_id'])
@@ -101,6 +102,7 @@ def create_secret(secrets_client, provider, secret_id, token):
             SecretString=json.dumps(new_secret_val),
             VersionStages=['AWSPENDING']
         )
+        secret.invalidate(secret_id)
     except botocore.exceptions.ClientError as error:
         if error.response['Error']['Code'] != 'ResourceExistsException':
             raise error
@@ -177,5 +179,6 @@ def finish_secret(secrets_client, arn, token):
         VersionStage="AWSCURRENT",
         MoveToVersionId=token,
         RemoveFromVersionId=current_version)
+    secret.invalidate(arn)
     logger.info(
         "finishSecret: Successfully set AWSCURRENT stage to version %s for secret %s.", token, arn)
@@ -0,0 +1,91 @@
+"""Cache is a small in-process LRU cache with optional expiry"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache():
+    """
+    Thread safe least recently used cache where entries also expire after
+    ttl seconds. Meant to live at module level so warm lambda containers
+    can reuse values between invocations.
+    """
+
+    def __init__(self, ttl=None, max_entries=128):
+        """Default constructor
+
+        Args:
+            ttl (float): seconds an entry stays valid, None to never expire
+            max_entries (int): entries kept before the least recently used is evicted
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        """Get an unexpired value, marking it as recently used"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl=None):
+        """
+        Add or replace a value, evicting the least recently used entry when full
+
+        Args:
+            key: key of the entry
+            value: value to cache
+            ttl (float): seconds this entry stays valid instead of the cache's ttl
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            expires_at = None if ttl is None else time.time() + ttl
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def get_or_load(self, key, load, ttl=None):
+        """Read through the cache, calling load() to fill a miss that stays valid for ttl"""
+        with self._lock:
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+        return self.put(key, load(), ttl)
+
+    def pop(self, key, default=None):
+        """Remove a single entry and return its value"""
+        with self._lock:
+            entry = self.entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def invalidate(self, match=None):
+        """Remove every entry whose key satisfies match, or all entries"""
+        with self._lock:
+            for key in [x for x in self.entries if match is None or match(x)]:
+                del self.entries[key]
+
+    def clear(self):
+        """Remove every entry and reset the counters"""
+        self.invalidate()
+        self.hits = 0
+        self.misses = 0
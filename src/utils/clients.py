@@ -0,0 +1,42 @@
+"""
+Lazy registry of boto3 clients shared by every handler in a container
+
+Creating a boto3 client loads and parses the service model, so modules no
+longer build their clients at import time. Each service client is created
+once, on first use, and reused by everything in the container.
+"""
+import threading
+
+import boto3
+
+CLIENTS = {}
+_LOCK = threading.Lock()
+
+
+def get_client(service):
+    """Get the shared client for an aws service, creating it on first use"""
+    with _LOCK:
+        if service not in CLIENTS:
+            CLIENTS[service] = boto3.client(service)
+        return CLIENTS[service]
+
+
+class LazyClient():
+    """
+    Module level stand-in for a boto3 client. Attribute access is forwarded
+    to the shared client of the service, which is only created then.
+    """
+
+    def __init__(self, service):
+        """Default constructor
+
+        Args:
+            service (str): aws service name, e.g. secretsmanager
+        """
+        self.service = service
+
+    def __getattr__(self, name):
+        return getattr(get_client(self.service), name)
+
+    def __repr__(self):
+        return f'LazyClient({self.service!r})'
@@ -1,19 +1,103 @@
 """Config util"""
 import os
+from botocore.exceptions import ClientError
 
-import boto3
+from . import clients, constants, secret
+from .cache import TTLCache
+from .constants import PROVIDER_STR
+from .retry import RetryPolicy
+from ..auth0_provider.store import TOKEN_STORES
+from ..auth0_provider.token import TOKENS
 
-from .constants import PROVIDER_STR, PROVIDER
-
-cfn = boto3.client('cloudformation')
+cfn = clients.LazyClient('cloudformation')
 MANAGEMENT_PREFIX = 'arn:aws:secretsmanager:us-east-1:123456789012:secret:'
 
-def get_provider(tenant):
-    """Get the provider with authentication"""
+# Authenticated providers kept alive between invocations, keyed by tenant
+PROVIDERS = TTLCache(max_entries=int(os.environ.get('PROVIDER_POOL_SIZE', 8)))
+# constants.PROVIDER, loaded by the first get_provider
+PROVIDER = None
+# Stack tags keyed by StackId
+STACK_TAGS = TTLCache(
+    ttl=float(os.environ.get('STACK_TAGS_TTL', 60)),
+    max_entries=int(os.environ.get('STACK_TAGS_CACHE_SIZE', 32)),
+)
+# describe_stacks is retried with this policy when cloudformation throttles it
+CFN_RETRY = RetryPolicy(
+    max_attempts=int(os.environ.get('CFN_MAX_ATTEMPTS', 5)),
+    max_elapsed=float(os.environ.get('CFN_MAX_RETRY_SECONDS', 10)),
+)
+THROTTLING_CODES = ('Throttling', 'ThrottlingException', 'RequestLimitExceeded')
+
+def get_token_store():
+    """
+    Build the shared token store named by the TOKEN_STORE environment
+    variable (ssm, file or memory). Returns None when it is not set.
+    """
+    name = os.environ.get('TOKEN_STORE')
+    if not name:
+        return None
+    if name not in TOKEN_STORES:
+        raise KeyError(
+            f'{name} not a valid token store in {",".join(TOKEN_STORES.keys())}'
+        )
+    return TOKEN_STORES[name]()
+
+
+def get_management_secret(tenant):
+    """Get the secrets manager location of the management api credentials for a tenant"""
     tenant_name = tenant.split('.')[0]
     environ = os.environ.get('ENVIRON')
-    management_secret = f'{MANAGEMENT_PREFIX}{environ}/{PROVIDER_STR}/tenant/{tenant_name}'
-    return PROVIDER(management_secret, tenant)
+    return f'{MANAGEMENT_PREFIX}{environ}/{PROVIDER_STR}/tenant/{tenant_name}'
+
+
+def get_provider(tenant):
+    """
+    Get the provider with authentication. Providers are pooled per tenant
+    and only authenticate again when their token is about to expire.
+    """
+    global PROVIDER  # pylint: disable=global-statement
+    if PROVIDER is None:
+        PROVIDER = constants.PROVIDER
+    if TOKENS.store is None:
+        TOKENS.store = get_token_store()
+    provider = PROVIDERS.get(tenant)
+    if provider is not None:
+        if not provider.is_authenticated():
+            provider.refresh()
+        return provider
+    provider = PROVIDER(get_management_secret(tenant), tenant)
+    provider.on_unauthorized = reauthorize
+    return PROVIDERS.put(tenant, provider)
+
+
+def reauthorize(provider, rejected):
+    """
+    Authenticate a provider again after auth0 rejected its token. The cached
+    token and management secret are dropped first, they are likely stale.
+    Returns the new access token.
+
+    Args:
+        provider (Auth0Provider): provider whose token was rejected
+        rejected (str): the access token auth0 answered with a 401
+    """
+    TOKENS.reject(provider.tenant, rejected)
+    evict_provider(provider.tenant)
+    provider.refresh()
+    PROVIDERS.put(provider.tenant, provider)
+    return provider.token['access_token']
+
+
+def evict_provider(tenant=None):
+    """
+    Drop the pooled provider, cached token and cached management secret for a
+    tenant, or for every tenant. Used when a secret is rotated or auth0
+    rejects a token.
+    """
+    tenants = list(PROVIDERS.entries) if tenant is None else [tenant]
+    for name in tenants:
+        PROVIDERS.pop(name)
+        secret.invalidate(get_management_secret(name))
+    TOKENS.invalidate(tenant)
 
 
 def set_tags(helper, event=None):
@@ -26,12 +110,35 @@ def set_tags(helper, event=None):
     additional = event.get('ResourceProperties', {}).get('AllowAdGroups')
     additional = {'AllowAdGroups': additional} if additional else {}
 
-    res = cfn.describe_stacks(StackName=helper.StackId)
+    raw_tags = get_stack_tags(helper.StackId)
 
     new_tags = {}
-    raw_tags = res['Stacks'][0]['Tags']
     for tag in raw_tags:
         new_tags[tag['Key']] = tag['Value']
     new_tags.update(additional)
     helper.Data.update({'tags': new_tags})
     helper.Data.update({'stack_tags': raw_tags})
+
+
+def throttled(_, error):
+    """Retry decision for describe_stacks, only throttling is retried"""
+    if isinstance(error, ClientError) and \
+            error.response.get('Error', {}).get('Code') in THROTTLING_CODES:
+        return 0
+    return None
+
+
+def describe_stack_tags(stack_id):
+    """Read the tags of a stack from cloudformation, retrying when it is throttled"""
+    res = CFN_RETRY.call(
+        lambda: cfn.describe_stacks(StackName=stack_id), throttled, name='describe_stacks')
+    return res['Stacks'][0]['Tags']
+
+
+def get_stack_tags(stack_id):
+    """
+    Get the tags of a stack. Tags are cached per stack for STACK_TAGS_TTL
+    seconds, every resource of a stack deployed in that window shares one read.
+    """
+    raw_tags = STACK_TAGS.get_or_load(stack_id, lambda: describe_stack_tags(stack_id))
+    return [dict(tag) for tag in raw_tags]
@@ -1,6 +1,15 @@
 """Constants to configure you custom resource"""
-from src.auth0_provider.index import Auth0Provider
+import importlib
 
 TENANT = 'my-tenant.auth0.com'
 PROVIDER_STR = 'auth0'
-PROVIDER = Auth0Provider
+# The provider class is only imported on first use, it pulls in the auth0 sdk
+PROVIDER_CLASS = 'src.auth0_provider.index.Auth0Provider'
+
+
+def __getattr__(name):
+    """Import PROVIDER the first time it is read"""
+    if name != 'PROVIDER':
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    module, _, cls = PROVIDER_CLASS.rpartition('.')
+    return getattr(importlib.import_module(module), cls)
@@ -0,0 +1,25 @@
+"""
+Diff normalized resource properties so updates only send what changed
+"""
+
+
+def changed_fields(old, new):
+    """
+    Get the top level fields of new that are missing from or differ in old.
+    Nested documents are compared whole and returned whole when they differ.
+    Fields only in old are left out, updates never unset a field.
+
+    Args:
+        old (dict): normalized properties before the update
+        new (dict): normalized properties after the update
+    """
+    return {
+        field: value for field, value in new.items()
+        if field not in old or old[field] != value
+    }
+
+
+def tenant_changed(event):
+    """Check whether an update moves the resource to another tenant"""
+    old = event['OldResourceProperties'].get('Tenant')
+    return old != event['ResourceProperties'].get('Tenant')
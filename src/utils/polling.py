@@ -0,0 +1,89 @@
+"""
+Adaptive schedule of the polls of a create
+
+A create is answered once none of the other resources of the deploy are
+still in progress, so a failing sibling can still tear it down, or once it
+has waited POLL_MAX_WAIT minutes. Resources served by this function don't
+count, they are in progress for as long as they poll themselves. The first
+poll comes after a minute and the interval doubles up to POLL_MAX_INTERVAL.
+By default a create waits at most two minutes, as long as it always did
+before it polled the stack, so dependent resources are never held longer.
+"""
+import json
+import os
+
+from . import stack_events
+
+# Minutes, the shortest rate an EventBridge schedule supports
+FIRST_INTERVAL = 1
+MAX_INTERVAL = int(os.environ.get('POLL_MAX_INTERVAL', 4))
+MAX_WAIT = int(os.environ.get('POLL_MAX_WAIT', 2))
+# Characters of the in progress resources remembered between polls. Poll data
+# is sent with the rule's target input, which EventBridge limits to 8192
+# characters together with the rest of the event
+MAX_TRACKED = 1024
+
+# Keys of the poll data
+INTERVAL = 'PollInterval'
+WAITED = 'PollWaited'
+IN_PROGRESS = 'StackInProgress'
+KEYS = (INTERVAL, WAITED, IN_PROGRESS, stack_events.CURSOR)
+
+# Type of the resources served by this function
+SERVED_TYPE = 'Custom::Authn_'
+
+
+def is_served(resource_type):
+    """Check if a resource is served by this function and polls its create too"""
+    return bool(resource_type) and resource_type.startswith(SERVED_TYPE)
+
+
+def schedule(data):
+    """
+    Add the interval that led to this poll to the wait and double it for
+    the next poll. Returns the next interval in minutes, or None once the
+    create has waited long enough.
+
+    Args:
+        data (dict): poll data, CrHelperData
+    """
+    interval = data.get(INTERVAL, FIRST_INTERVAL)
+    waited = data.get(WAITED, 0) + interval
+    data[WAITED] = waited
+    if waited >= MAX_WAIT:
+        return None
+    data[INTERVAL] = min(interval * 2, MAX_INTERVAL, MAX_WAIT - waited)
+    return data[INTERVAL]
+
+
+def siblings_in_progress(data, state, exclude):
+    """
+    Update the resources in progress with the latest scan and return them.
+    Polls only read new events, so the set is kept in the poll data.
+    Resources served by this function are left out, two of them waiting
+    on each other would both wait until MAX_WAIT.
+
+    Args:
+        data (dict): poll data, CrHelperData
+        state (StackState): analysis of the events read by this poll
+        exclude (list): logical ids that don't count, the resource itself and its stack
+    """
+    in_progress = set(data.get(IN_PROGRESS) or ())
+    for name, status in state.resources.items():
+        if status.endswith('_IN_PROGRESS') and not is_served(state.types.get(name)):
+            in_progress.add(name)
+        else:
+            in_progress.discard(name)
+    in_progress = sorted(in_progress.difference(exclude))
+    if len(json.dumps(in_progress)) > MAX_TRACKED:
+        # too many to remember, the next poll reads the whole deploy again
+        data.pop(IN_PROGRESS, None)
+        data.pop(stack_events.CURSOR, None)
+    else:
+        data[IN_PROGRESS] = in_progress
+    return in_progress
+
+
+def rate(minutes):
+    """EventBridge schedule expression of an interval"""
+    return f'rate({minutes} {"minute" if minutes == 1 else "minutes"})'
@@ -0,0 +1,98 @@
+"""Retry is a utility for retrying throttled or flaky calls with backoff"""
+import logging
+import random
+import time
+
+logger = logging.getLogger('aws-auth0-cr')
+
+# Epoch time by which every retry must have finished, set per invocation
+DEADLINE = None
+# Seconds of the invocation kept back for sending the cloudformation response
+DEADLINE_BUFFER = 2
+
+
+def set_deadline(context):
+    """
+    Bound retries by the time left in the lambda invocation
+
+    Args:
+        context (LambdaContext): context of the current invocation
+    """
+    global DEADLINE  # pylint: disable=global-statement
+    try:
+        remaining = context.get_remaining_time_in_millis() / 1000
+    except AttributeError:
+        DEADLINE = None
+        return
+    DEADLINE = time.time() + remaining - DEADLINE_BUFFER
+
+
+class RetryPolicy():
+    """
+    Retry a call with decorrelated jitter backoff until it succeeds, runs out
+    of attempts, or would run past max_elapsed or the invocation deadline.
+    """
+
+    def __init__(self, max_attempts=4, max_elapsed=10, base=0.1, cap=5):
+        """Default constructor
+
+        Args:
+            max_attempts (int): attempts including the first one
+            max_elapsed (float): seconds after which no new attempt is started
+            base (float): smallest wait between attempts
+            cap (float): largest backoff between attempts
+        """
+        self.max_attempts = max_attempts
+        self.max_elapsed = max_elapsed
+        self.base = base
+        self.cap = cap
+        self.calls = 0
+        self.retries = 0
+
+    def backoff(self, previous):
+        """Decorrelated jitter: a random wait between base and three times the last one"""
+        return min(self.cap, random.uniform(self.base, previous * 3))  # nosec
+
+    def call(self, func, retry_after, name='call'):
+        """Call func, retrying while retry_after asks for it
+
+        Args:
+            func (callable): the call to make
+            retry_after (callable): given (result, error) returns None when the
+                outcome is final, otherwise the minimum seconds to wait, e.g.
+                from a Retry-After header
+            name (str): description of the call for the logs
+        """
+        self.calls += 1
+        start = time.time()
+        delay = self.base
+        attempt = 0
+        while True:
+            attempt += 1
+            result, error = None, None
+            try:
+                result = func()
+            except Exception as err:  # pylint: disable=broad-except
+                error = err
+            wait = retry_after(result, error)
+            if wait is not None and attempt < self.max_attempts:
+                delay = self.backoff(delay)
+                wait = max(wait, delay)
+                if self.can_wait(start, wait):
+                    self.retries += 1
+                    logger.warning(
+                        '%s failed on attempt %d, retrying in %.2fs', name, attempt, wait)
+                    time.sleep(wait)
+                    continue
+            if attempt > 1:
+                logger.info('%s finished after %d retries', name, attempt - 1)
+            if error is not None:
+                raise error
+            return result
+
+    def can_wait(self, start, wait):
+        """Check another attempt after wait seconds fits the time budget"""
+        resume = time.time() + wait
+        if resume - start > self.max_elapsed:
+            return False
+        return DEADLINE is None or resume < DEADLINE
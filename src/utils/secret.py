@@ -1,13 +1,55 @@
 """Secret is a utility for getting a secrets manager secret value"""
 import base64
 import logging
+import os
 from botocore.exceptions import ClientError
 
+from .cache import TTLCache
+
 logger = logging.getLogger('aws-auth0-cr')
 
+# AWSCURRENT secret values keyed by (SecretId, VersionStage). Set SECRET_CACHE_TTL=0 to disable
+CACHE = TTLCache(
+    ttl=float(os.environ.get('SECRET_CACHE_TTL', 300)),
+    max_entries=int(os.environ.get('SECRET_CACHE_SIZE', 64)),
+)
+# A rotation moves AWSCURRENT to a new version and only the rotating container
+# invalidates its cache, other warm containers read the old value until their
+# entry expires. Keep that window short, Auth0 drops the old client secret.
+CURRENT_TTL = min(float(os.environ.get('SECRET_CURRENT_CACHE_TTL', 30)), CACHE.ttl)
+# The only stage that is cached, the others are read during rotations and
+# a retried rotation must see the pending value it just wrote
+CACHED_STAGE = 'AWSCURRENT'
+
+
+def invalidate(secret_id):
+    """
+    Drop every cached version stage of a secret. Call this after changing
+    the secret's value or stages, e.g. put_secret_value or
+    update_secret_version_stage.
+    """
+    CACHE.invalidate(lambda key: key[0] == secret_id)
+
+
 def get_muxed_secret(client, secret_id, stage='AWSCURRENT'):
     """
     Get a secret from secrets manager with the value
+    decoded to SecretValue. AWSCURRENT reads are cached per secret id for
+    CURRENT_TTL seconds, other stages are always read from secrets manager
+    """
+    if stage != CACHED_STAGE:
+        return read_muxed_secret(client, secret_id, stage)
+    resource = CACHE.get_or_load(
+        (secret_id, stage),
+        lambda: read_muxed_secret(client, secret_id, stage),
+        CURRENT_TTL,
+    )
+    return dict(resource)
+
+
+def read_muxed_secret(client, secret_id, stage='AWSCURRENT'):
+    """
+    Read a secret from secrets manager, bypassing the cache, with the value
     decoded to SecretValue
     """
     try:
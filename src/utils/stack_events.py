@@ -0,0 +1,177 @@
+"""
+Incremental scanning of cloudformation stack events
+
+describe_stack_events pages through the whole history of a stack, newest
+first. A poll only needs the events of the deploy in progress, and only
+those it hasn't read on an earlier poll, so scanning stops at the last
+event already read or at the User Initiated event that started the deploy.
+"""
+import logging
+
+from . import config
+
+logger = logging.getLogger('aws-auth0-cr')
+
+# Key of the newest event read so far in the poll data
+CURSOR = 'StackEventCursor'
+DEPLOY_START = 'User Initiated'
+
+
+def is_deploy_start(event):
+    """Check for the event of the stack itself that started the current deploy"""
+    return event.get('ResourceStatusReason') == DEPLOY_START
+
+
+def describe_page(client, stack_id, token=None):
+    """Read a page of stack events, retrying when cloudformation throttles the call"""
+    kwargs = {'StackName': stack_id}
+    if token:
+        kwargs['NextToken'] = token
+    return config.CFN_RETRY.call(
+        lambda: client.describe_stack_events(**kwargs),
+        config.throttled,
+        name='describe_stack_events',
+    )
+
+
+def scan(client, stack_id, last_event_id=None):
+    """
+    Read the events of the current deploy that are newer than last_event_id,
+    newest first. The start of the deploy is included.
+
+    Args:
+        client: cloudformation client
+        stack_id (str): stack to read the events of
+        last_event_id (str): newest event read by an earlier scan, None for the first
+    """
+    events = []
+    token = None
+    pages = 0
+    while True:
+        page = describe_page(client, stack_id, token)
+        pages += 1
+        for event in page['StackEvents']:
+            if event['EventId'] == last_event_id:
+                logger.debug('read %d new stack events in %d pages', len(events), pages)
+                return events
+            events.append(event)
+            if is_deploy_start(event):
+                logger.debug('read %d stack events in %d pages', len(events), pages)
+                return events
+        token = page.get('NextToken')
+        if not token:
+            return events
+
+
+def scan_new(client, stack_id, data):
+    """
+    Read the stack events added since the last scan of a poll and move the
+    cursor kept in the poll data on to the newest one
+
+    Args:
+        client: cloudformation client
+        stack_id (str): stack to read the events of
+        data (dict): poll data, CrHelperData, that keeps the cursor between polls
+    """
+    events = scan(client, stack_id, data.get(CURSOR))
+    if events:
+        data[CURSOR] = events[0]['EventId']
+    return events
+
+
+# Statuses of a resource, nested stack or the stack itself that fail the deploy
+FAILURE_STATUSES = frozenset([
+    'CREATE_FAILED',
+    'UPDATE_FAILED',
+    'IMPORT_FAILED',
+    'ROLLBACK_IN_PROGRESS',
+    'ROLLBACK_FAILED',
+    'ROLLBACK_COMPLETE',
+    'UPDATE_ROLLBACK_IN_PROGRESS',
+    'UPDATE_ROLLBACK_FAILED',
+    'UPDATE_ROLLBACK_COMPLETE_CLEANUP_IN_PROGRESS',
+    'UPDATE_ROLLBACK_COMPLETE',
+    'IMPORT_ROLLBACK_IN_PROGRESS',
+    'IMPORT_ROLLBACK_FAILED',
+    'IMPORT_ROLLBACK_COMPLETE',
+])
+# Statuses of the stack itself after a deploy went through
+SUCCESS_STATUSES = frozenset([
+    'CREATE_COMPLETE',
+    'UPDATE_COMPLETE_CLEANUP_IN_PROGRESS',
+    'UPDATE_COMPLETE',
+    'IMPORT_COMPLETE',
+])
+FAILING = 'failing'
+SUCCEEDED = 'succeeded'
+
+
+class StackState():
+    """
+    State of the current deploy of a stack, built from its events newest
+    first. Each resource is indexed with its latest status and its type.
+    """
+
+    def __init__(self):
+        self.resources = {}
+        self.types = {}
+        self.failures = []
+        self.outcome = None
+        self.started = False
+        self.read = 0
+
+    @property
+    def failing(self):
+        """The deploy failed or is rolling back"""
+        return self.outcome == FAILING
+
+    def statuses(self):
+        """Logical ids of the resources by their latest status"""
+        statuses = {}
+        for name, status in self.resources.items():
+            statuses.setdefault(status, []).append(name)
+        return statuses
+
+    def in_progress(self):
+        """Logical ids of the resources whose latest status is in progress"""
+        return [
+            name for name, status in self.resources.items() if status.endswith('_IN_PROGRESS')
+        ]
+
+
+def analyse(events, complete=False):
+    """
+    Work out the state of the current deploy from its events, newest first,
+    in a single pass. Reading stops as soon as the outcome is known unless
+    complete is set, and always at the start of the deploy.
+
+    Args:
+        events (iterable): stack events, newest first
+        complete (bool): index every event of the deploy
+    """
+    state = StackState()
+    resources = state.resources
+    types = state.types
+    outcome = None
+    read = 0
+    for event in events:
+        read += 1
+        status = event['ResourceStatus']
+        if event['LogicalResourceId'] not in resources:
+            resources[event['LogicalResourceId']] = status
+            types[event['LogicalResourceId']] = event.get('ResourceType')
+        if status in FAILURE_STATUSES:
+            state.failures.append(event)
+            outcome = FAILING
+        elif outcome is None and status in SUCCESS_STATUSES and 'StackId' in event \
+                and event.get('PhysicalResourceId') == event['StackId']:
+            # the stack itself, a nested stack completing doesn't end the deploy
+            outcome = SUCCEEDED
+        if event.get('ResourceStatusReason') == DEPLOY_START:
+            state.started = True
+            break
+        if outcome is not None and not complete:
+            break
+    state.outcome = outcome
+    state.read = read
+    return state
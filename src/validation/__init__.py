@@ -1,8 +1,39 @@
 """
 Schema validation
 """
+import os
+from functools import lru_cache
+
 import stringcase
 from cerberus import Validator
+from cerberus.errors import ErrorList
+
+from .compiled import Fallback, compile_schema
+
+# Distinct property names remembered, the schemas only have a few dozen
+KEY_CACHE_SIZE = 1024
+# Validate with the compiled schema first, set to false to always use cerberus
+COMPILED_VALIDATION = os.environ.get('COMPILED_VALIDATION', 'true').lower() == 'true'
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def snake_key(key):
+    """Snake case a property name, memoised since the same names come in every event"""
+    return stringcase.snakecase(key)
+
+
+def snake_document(document):
+    """
+    Copy a document with every key snake cased. Lists without nested
+    documents are copied as they are.
+    """
+    if isinstance(document, dict):
+        return {snake_key(key): snake_document(value) for key, value in document.items()}
+    if isinstance(document, list):
+        if not any(isinstance(value, (dict, list)) for value in document):
+            return list(document)
+        return [snake_document(value) for value in document]
+    return document
 
 
 def to_bool(val):
@@ -20,6 +51,7 @@ class AuthnValidator(Validator):
     def __init__(self, schema, *args, with_defaults=None, **kwargs):
         super().__init__(schema, *args, **kwargs)
         self.with_defaults = with_defaults
+        self.compiled = compile_schema(self.schema, self.types_mapping, self.purge_unknown)
 
     def validated(  # pylint: disable=too-many-arguments, arguments-differ
             self,
@@ -29,23 +61,55 @@ class AuthnValidator(Validator):
             normalize=True,
             always_return_document=False,
     ):
-        """ overload internal validated to change the order of operations"""
-        if schema is None:
-            schema = self.schema
+        """
+        overload internal validated to change the order of operations.
+        Documents the compiled schema accepts skip cerberus, everything
+        else, including every invalid document, goes through cerberus.
+        """
+        fast = (COMPILED_VALIDATION and self.compiled is not None and schema is None
+                and not update and normalize and not always_return_document)
+        if fast and isinstance(document, dict):
+            try:
+                validated = self.compiled.validated(self.normalize_document(document))
+            except Fallback:
+                pass
+            else:
+                self._errors = ErrorList()
+                return self.apply_defaults(validated)
+        return self.cerberus_validated(
+            document, schema, update, normalize, always_return_document)
+
+    def cerberus_validated(  # pylint: disable=too-many-arguments
+            self,
+            document,
+            schema=None,
+            update=False,
+            normalize=True,
+            always_return_document=False,
+    ):
+        """validate and normalize with cerberus alone"""
+        # Only pass a schema on to cerberus when one was given, cerberus wraps
+        # it in a new DefinitionSchema every time, and wrapping self.schema
+        # nests it one level deeper on each call
+        rules = self.schema if schema is None else schema
         document = self.normalize_document(document)
         if normalize:
             # Purge readonly
-            for field in [x for x in document if schema.get(x, {}).get('readonly', False)]:
+            for field in [x for x in document if rules.get(x, {}).get('readonly', False)]:
                 document.pop(field)
-            # Coerce
-            self.coerce_mapping(document, schema)
+            # Coerce. Coercion errors are recorded against self.document and
+            # dropped when validation starts, the value is then rejected by
+            # its other rules. Point it at this document so recording works
+            # on a validator that hasn't run cerberus yet
+            self.document = document
+            self.coerce_mapping(document, rules)
         document = super().validated(document, schema=schema, update=update, normalize=False,
                                      always_return_document=always_return_document)
         if document is None:
             return document
         if normalize:
             # Purge unknown before we normalize
-            for field in [x for x in document if x not in schema]:
+            for field in [x for x in document if x not in rules]:
                 document.pop(field)
             normalized = self.normalized(document, schema)
             return self.apply_defaults(normalized)
@@ -74,20 +138,10 @@ class AuthnValidator(Validator):
 
     def normalize_document(self, document):
         """
-        convert all input keys to snakecase
+        convert all input keys to snakecase. The document is always copied,
+        coercion and purging change the result in place.
         """
-        out = None
-        if isinstance(document, dict):
-            out = {}
-            for key, value in document.items():
-                out[stringcase.snakecase(key)] = self.normalize_document(value)
-            return out
-        if isinstance(document, list):
-            out = []
-            for value in document:
-                out.append(self.normalize_document(value))
-            return out
-        return document
+        return snake_document(document)
 
     def _validate_isodd(self, isodd, field, value):
         """ Test the oddity of a value.
@@ -0,0 +1,260 @@
+"""
+Compiled fast path for AuthnValidator.validated
+
+Cerberus walks a document several times per validation and builds child
+validators for every nested document. A schema is compiled once into plain
+rule objects that run the same steps as AuthnValidator.validated: purge
+readonly fields, coerce, validate, rename, purge unknown fields, fill
+defaults, coerce again and normalise nested documents.
+
+The fast path only ever accepts a document. Whenever it finds anything it
+would reject, or that it is not sure Cerberus would accept, it raises
+Fallback and the Cerberus path runs instead, so invalid documents get
+exactly the errors they always did. Schemas using rules that are not
+compiled are left to Cerberus entirely.
+"""
+from collections.abc import Mapping, Sequence, Sized
+
+# Rules the compiler understands, any other rule keeps a schema on cerberus
+RULES = {
+    'allowed', 'anyof', 'coerce', 'default', 'dependencies', 'empty', 'max', 'min',
+    'readonly', 'rename', 'required', 'schema', 'type',
+}
+_MISSING = object()
+
+
+class Fallback(Exception):
+    """The fast path can't vouch for a document, let cerberus handle it"""
+
+
+class Unsupported(Exception):
+    """A schema uses rules the compiler does not handle"""
+
+
+def _as_list(value):
+    """Wrap single rule values the way cerberus does"""
+    if isinstance(value, str) or not isinstance(value, Sequence):
+        return [value]
+    return list(value)
+
+
+class Field():  # pylint: disable=too-many-instance-attributes
+    """Compiled rules of one field"""
+
+    def __init__(self, rules, types_mapping, purge_unknown, inherited_type=None):
+        """Compile the rules set of a field
+
+        Args:
+            rules (dict): cerberus rules of the field
+            types_mapping (dict): type name to cerberus TypeDefinition
+            purge_unknown (bool): purge unknown fields of nested documents
+            inherited_type: type rule to use when rules has none, for anyof
+        """
+        unsupported = set(rules) - RULES
+        if unsupported:
+            raise Unsupported(', '.join(sorted(unsupported)))
+        type_rule = rules.get('type', inherited_type)
+        self.type_names = _as_list(type_rule) if type_rule is not None else []
+        try:
+            self.types = [types_mapping[name] for name in self.type_names]
+        except KeyError as err:
+            raise Unsupported(f'type {err}') from err
+        self.readonly = rules.get('readonly', False)
+        self.required = rules.get('required', False)
+        self.empty = rules.get('empty', True)
+        self.rename = rules.get('rename')
+        self.allowed = rules.get('allowed')
+        self.min = rules.get('min', _MISSING)
+        self.max = rules.get('max', _MISSING)
+        self.default = rules.get('default', _MISSING)
+        coerce = rules.get('coerce')
+        if coerce is not None and not callable(coerce):
+            raise Unsupported('named or chained coerce')
+        self.coerce = coerce
+        self.dependencies = self._dependencies(rules.get('dependencies'))
+        self.anyof = [
+            Field(alternative, types_mapping, purge_unknown, type_rule)
+            for alternative in rules.get('anyof', [])
+        ]
+        # a schema rule describes the items of lists and the fields of anything else
+        self.items = None
+        self.mapping = None
+        if 'schema' in rules:
+            if 'list' in self.type_names:
+                self.items = Field(rules['schema'], types_mapping, purge_unknown)
+            else:
+                self.mapping = CompiledSchema(rules['schema'], types_mapping, purge_unknown)
+
+    @staticmethod
+    def _dependencies(dependencies):
+        """Normalise dependencies to a dict of field to accepted values, None for any"""
+        if dependencies is None:
+            return {}
+        if isinstance(dependencies, Mapping):
+            return {name: _as_list(values) for name, values in dependencies.items()}
+        return {name: None for name in _as_list(dependencies)}
+
+    def check(self, value, document):
+        """Raise Fallback unless cerberus would accept value in document"""
+        if value is None:
+            raise Fallback()
+        if self.types and not any(
+                isinstance(value, kind.included_types)
+                and not isinstance(value, kind.excluded_types)
+                for kind in self.types):
+            raise Fallback()
+        if not self.empty and isinstance(value, Sized) and not value:
+            raise Fallback()
+        for name, accepted in self.dependencies.items():
+            present = document.get(name)
+            if present is None or (accepted is not None and present not in accepted):
+                raise Fallback()
+        if self.allowed is not None:
+            values = value if isinstance(value, Sequence) and not isinstance(value, str) \
+                else [value]
+            if any(item not in self.allowed for item in values):
+                raise Fallback()
+        self.check_bounds(value)
+        if self.anyof:
+            self.check_anyof(value, document)
+        self.check_nested(value)
+
+    def check_bounds(self, value):
+        """Apply min and max, values that can't be compared are left to cerberus"""
+        try:
+            if self.min is not _MISSING and value < self.min:
+                raise Fallback()
+            if self.max is not _MISSING and value > self.max:
+                raise Fallback()
+        except TypeError as err:
+            raise Fallback() from err
+
+    def check_nested(self, value):
+        """Check list items and nested documents against their schema"""
+        if self.items is not None:
+            if not isinstance(value, list):
+                raise Fallback()
+            for item in value:
+                self.items.check(item, {})
+        if self.mapping is not None:
+            if not isinstance(value, dict):
+                raise Fallback()
+            self.mapping.check(value)
+
+    def check_anyof(self, value, document):
+        """At least one alternative has to accept the value"""
+        for alternative in self.anyof:
+            try:
+                alternative.check(value, document)
+                return
+            except Fallback:
+                continue
+        raise Fallback()
+
+    def apply_coerce(self, value):
+        """Coerce a value, any coercion error is left to cerberus"""
+        if self.coerce is None:
+            return value
+        try:
+            return self.coerce(value)
+        except Exception as err:  # pylint: disable=broad-except
+            raise Fallback() from err
+
+    def normalize(self, value):
+        """Normalise a value the way cerberus normalises containers"""
+        if isinstance(value, str):
+            return value
+        if isinstance(value, dict) and self.mapping is not None:
+            return self.mapping.normalize(value)
+        if isinstance(value, list) and self.items is not None:
+            return [self.items.normalize(self.items.apply_coerce(item)) for item in value]
+        return value
+
+
+class CompiledSchema():
+    """A cerberus schema compiled for the fast path"""
+
+    def __init__(self, schema, types_mapping, purge_unknown=False):
+        """Compile a schema
+
+        Args:
+            schema (dict): cerberus schema
+            types_mapping (dict): type name to cerberus TypeDefinition
+            purge_unknown (bool): drop unknown fields while normalising
+        """
+        self.fields = {
+            name: Field(dict(rules), types_mapping, purge_unknown)
+            for name, rules in schema.items()
+        }
+        self.purge_unknown = purge_unknown
+        self.readonly = [name for name, field in self.fields.items() if field.readonly]
+        self.required = [name for name, field in self.fields.items() if field.required]
+        self.defaults = [
+            (name, field.default) for name, field in self.fields.items()
+            if field.default is not _MISSING
+        ]
+
+    def coerce(self, mapping):
+        """First coercion, of the fields and of nested documents with a schema"""
+        for name, value in mapping.items():
+            field = self.fields.get(name)
+            if field is None:
+                if isinstance(value, dict):
+                    # AuthnValidator.coerce_mapping fails on these
+                    raise Fallback()
+                continue
+            value = mapping[name] = field.apply_coerce(value)
+            if isinstance(value, dict) and field.mapping is not None:
+                field.mapping.coerce(value)
+            elif isinstance(value, dict) and field.items is not None:
+                raise Fallback()
+
+    def check(self, mapping):
+        """Raise Fallback unless cerberus would accept the mapping"""
+        for name, value in mapping.items():
+            field = self.fields.get(name)
+            if field is None or field.readonly:
+                raise Fallback()
+            field.check(value, mapping)
+        for name in self.required:
+            if name not in mapping:
+                raise Fallback()
+
+    def normalize(self, mapping):
+        """Rename, purge, default, coerce and recurse, in cerberus' order"""
+        for name in tuple(mapping):
+            field = self.fields.get(name)
+            if field is not None and field.rename is not None:
+                mapping[field.rename] = mapping.pop(name)
+        if self.purge_unknown:
+            for name in [name for name in mapping if name not in self.fields]:
+                del mapping[name]
+        if any(name in mapping for name in self.readonly):
+            raise Fallback()
+        for name, default in self.defaults:
+            if name not in mapping:
+                mapping[name] = default
+        for name, value in mapping.items():
+            field = self.fields.get(name)
+            if field is not None:
+                mapping[name] = field.normalize(field.apply_coerce(value))
+        return mapping
+
+    def validated(self, document):
+        """
+        Validate and normalise a snake cased copy of a document in place.
+        Raises Fallback if cerberus should decide instead.
+        """
+        for name in self.readonly:
+            document.pop(name, None)
+        self.coerce(document)
+        self.check(document)
+        return self.normalize(document)
+
+
+def compile_schema(schema, types_mapping, purge_unknown=False):
+    """Compile a schema, None if it uses rules that are left to cerberus"""
+    try:
+        return CompiledSchema(schema, types_mapping, purge_unknown)
+    except Unsupported:
+        return None
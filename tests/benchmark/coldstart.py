@@ -0,0 +1,148 @@
+"""
+Measure one cold start of the custom resource lambda, offline
+
+Run in a fresh interpreter for every measurement:
+
+    python -m tests.benchmark.coldstart Authn_Api Create
+
+AWS and Auth0 are stubbed below the sdks, at botocore's api call and the
+shared requests session, so everything above them runs as it would in the
+lambda. Prints a JSON object with import_ms, invoke_ms and max_rss_kb.
+"""
+import json
+import os
+import resource
+import sys
+import time
+from unittest.mock import patch, MagicMock as Mock
+
+TENANT = 'my-tenant.auth0.com'
+
+SECRET = json.dumps({
+    'tenant': TENANT,
+    'AUTH0_CLIENT_ID': 'bench-admin',
+    'AUTH0_CLIENT_SECRET': 'bench-secret',
+    'client_id': 'bench-client',
+})
+AWS_RESPONSES = {
+    'GetSecretValue': {
+        'SecretString': SECRET, 'ARN': 'arn:aws:secretsmanager:bench', 'Name': 'bench'},
+    'DescribeStacks': {'Stacks': [{'Tags': [{'Key': 'ApplicationID', 'Value': 'bench'}]}]},
+    'DescribeStackEvents': {'StackEvents': []},
+    'CreateSecret': {'ARN': 'arn:aws:secretsmanager:bench'},
+    'PutRule': {'RuleArn': 'arn:aws:events:us-east-1:123456789012:rule/bench-rule'},
+}
+# One body that satisfies every auth0 call the handlers make
+AUTH0_BODY = {
+    'id': 'bench-id',
+    'client_id': 'bench-client',
+    'client_secret': 'bench-secret',
+    'access_token': 'bench-token',
+    'expires_in': 86400,
+    'enabled_clients': [],
+}
+
+PROPERTIES = {
+    'Authn_Application': {
+        'Tenant': TENANT,
+        'Name': 'bench-app',
+        'Description': 'benchmark application',
+        'Type': 'spa',
+        'CallbackUrls': ['https://bench.example.com/callback'],
+        'Connections': ['con_bench'],
+    },
+    'Authn_Api': {
+        'Tenant': TENANT,
+        'Name': 'bench-api',
+        'Audience': 'https://bench.example.com/api',
+        'Scopes': ['read:bench'],
+    },
+    'Authn_Grant': {
+        'Tenant': TENANT,
+        'ApplicationId': 'bench-client',
+        'Audience': 'https://bench.example.com/api',
+    },
+}
+# Update events change one field so the update goes all the way to auth0
+CHANGED = {
+    'Authn_Application': {'Description': 'old description'},
+    'Authn_Api': {'Scopes': ['read:old']},
+    'Authn_Grant': {'Audience': 'https://bench.example.com/old'},
+}
+
+
+def make_event(resource_type, request_type):
+    """Build a cloudformation custom resource event"""
+    props = {'ServiceToken': 'arn:aws:lambda:bench', **PROPERTIES[resource_type]}
+    event = {
+        'RequestType': request_type,
+        'ResponseURL': 'https://cloudformation-custom-resource-response.example.com/bench',
+        'StackId': 'arn:aws:cloudformation:us-east-1:123456789012:stack/bench/1',
+        'RequestId': 'bench-request',
+        'LogicalResourceId': 'Bench',
+        'ResourceType': f'Custom::{resource_type}',
+        'ResourceProperties': props,
+    }
+    if request_type != 'Create':
+        event['PhysicalResourceId'] = 'bench-client'
+    if request_type == 'Update':
+        event['OldResourceProperties'] = {**props, **CHANGED[resource_type]}
+    return event
+
+
+def make_context():
+    """Build a lambda context with 20s left"""
+    context = Mock()
+    context.function_name = 'bench'
+    context.invoked_function_arn = 'arn:aws:lambda:us-east-1:123456789012:function:bench'
+    context.log_group_name = '/aws/lambda/bench'
+    context.log_stream_name = 'bench'
+    context.get_remaining_time_in_millis.return_value = 20000
+    return context
+
+
+def aws_call(_, operation, __):
+    """Stand in for botocore.client.BaseClient._make_api_call"""
+    return AWS_RESPONSES.get(operation, {})
+
+
+def auth0_session():
+    """Stand in for the shared requests session, remembering connection writes"""
+    body = dict(AUTH0_BODY)
+
+    def request(method, url, **kwargs):  # pylint: disable=unused-argument
+        if method == 'PATCH' and 'enabled_clients' in (kwargs.get('json') or {}):
+            body['enabled_clients'] = kwargs['json']['enabled_clients']
+        response = Mock()
+        response.status_code = 200
+        response.text = json.dumps(body)
+        response.headers = {}
+        return response
+
+    session = Mock()
+    session.request.side_effect = request
+    return session
+
+
+def run(resource_type, request_type):
+    """Import the handler and send it one event, return the measurements"""
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('ENVIRON', 'bench')
+    start = time.perf_counter()
+    from src import custom_resource  # pylint: disable=import-outside-toplevel
+    imported = time.perf_counter()
+    with patch('botocore.client.BaseClient._make_api_call', aws_call), \
+            patch('src.auth0_provider.session.get_session', return_value=auth0_session()), \
+            patch('crhelper.resource_helper.CfnResource._send', Mock()):
+        custom_resource.lambda_handler(
+            make_event(resource_type, request_type), make_context())
+    invoked = time.perf_counter()
+    return {
+        'import_ms': (imported - start) * 1000,
+        'invoke_ms': (invoked - imported) * 1000,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(*sys.argv[1:3])))
@@ -0,0 +1,47 @@
+"""
+Micro-benchmark of property name normalisation on large payloads
+
+    make benchmark target=/test_normalize.py
+"""
+from unittest.mock import patch
+import pytest
+import stringcase
+
+from src.validation import snake_document
+
+pytest.importorskip('pytest_benchmark')
+
+
+def large_properties():
+    """Application properties with large ClientMetadata, Mobile and JWTConfiguration"""
+    return {
+        'Name': 'bench-app',
+        'Description': 'benchmark application',
+        'Type': 'native',
+        'CallbackUrls': [f'https://bench.example.com/{i}/callback' for i in range(100)],
+        'ClientMetadata': {f'MetadataKey{i}': f'value {i}' for i in range(200)},
+        'JWTConfiguration': {
+            'LifetimeInSeconds': '3600',
+            'Alg': 'RS256',
+            'Scopes': {f'Scope{i}': {'Description': f'scope {i}'} for i in range(100)},
+        },
+        'Mobile': {
+            'Android': {
+                'AppPackageName': 'com.example.bench',
+                'Sha256CertFingerprints': [f'{i:064x}' for i in range(50)],
+            },
+            'Ios': {'TeamId': 'BENCH', 'AppBundleIdentifier': 'com.example.bench'},
+        },
+    }
+
+
+@pytest.mark.parametrize('keys', ['memoised', 'stringcase'])
+def test_snake_document(benchmark, keys):
+    """Normalise a large document with and without the memoised key conversion"""
+    document = large_properties()
+    if keys == 'stringcase':
+        with patch('src.validation.snake_key', stringcase.snakecase):
+            result = benchmark(snake_document, document)
+    else:
+        result = benchmark(snake_document, document)
+    assert len(result['client_metadata']) == 200
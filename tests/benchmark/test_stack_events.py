@@ -0,0 +1,68 @@
+"""
+Benchmark of stack failure detection on large deploys
+
+The stack event fixtures are scaled up with thousands of events of other
+resources, either newer than everything else in the deploy or just after
+its start, and analysed the way poll_create does.
+
+    make benchmark target=/test_stack_events.py
+"""
+import pytest
+
+from src.utils import stack_events as analyser
+from tests.unit.fixtures import stack_events
+
+pytest.importorskip('pytest_benchmark')
+
+# Events of other resources added to each fixture
+EXTRA_EVENTS = 10000
+
+
+def filler(count):
+    """Events of resources deploying alongside ours, newest first"""
+    events = []
+    for i in range(count // 2):
+        for status in ('CREATE_COMPLETE', 'CREATE_IN_PROGRESS'):
+            events.append({
+                'EventId': f'Filler{i}-{status}',
+                'LogicalResourceId': f'Filler{i}',
+                'ResourceType': 'AWS::SSM::Parameter',
+                'ResourceStatus': status,
+            })
+    return events
+
+
+def scaled(case, position):
+    """A fixture with EXTRA_EVENTS more events in its current deploy"""
+    events = case['StackEvents']
+    start = next(i for i, event in enumerate(events) if analyser.is_deploy_start(event))
+    at = 0 if position == 'newest' else start
+    return events[:at] + filler(EXTRA_EVENTS) + events[at:]
+
+
+def legacy_is_failing(events):
+    """stack_is_failing as it was, for comparison"""
+    failed = False
+    failure_modes = ('CREATE_FAILED', 'UPDATE_ROLLBACK_IN_PROGRESS')
+    for event in events['StackEvents']:
+        if event['ResourceStatus'] in failure_modes:
+            failed = True
+        if event.get('ResourceStatusReason') == "User Initiated":
+            break
+    return failed
+
+
+@pytest.mark.parametrize('engine', ['analyse', 'legacy'])
+@pytest.mark.parametrize('position', ['newest', 'oldest'])
+@pytest.mark.parametrize('case', stack_events.get(), ids=stack_events.get(True))
+def test_stack_is_failing(benchmark, case, position, engine):
+    """Detect the outcome of each fixture scaled up to more than 10k events"""
+    events = {'StackEvents': scaled(case, position)}
+    if engine == 'legacy':
+        failing = benchmark(legacy_is_failing, events)
+    else:
+        state = benchmark(analyser.analyse, events['StackEvents'])
+        failing = state.failing
+        benchmark.extra_info['events_read'] = state.read
+        print(f'\n{case["name"]} {position}: read {state.read} of {len(events["StackEvents"])}')
+    assert failing is not case['success']
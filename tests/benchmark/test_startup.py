@@ -0,0 +1,102 @@
+"""
+Cold start benchmarks of the lambda handlers
+
+Every measurement runs in a fresh interpreter so nothing is warm. Results
+are compared to baseline.json and fail when they regress by more than
+BENCHMARK_TOLERANCE. Timings depend on the host, so the baseline is recorded
+locally, not committed, and the comparisons are skipped until it exists.
+
+    make benchmark-baseline
+    make benchmark
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+from tests.benchmark.coldstart import PROPERTIES
+from tests.importtime import ROOT, import_times
+
+BASELINE = Path(__file__).parent / 'baseline.json'
+# Cold processes started per measurement, the median is kept
+RUNS = int(os.environ.get('BENCHMARK_RUNS', 3))
+# Allowed slowdown against the baseline, as a ratio
+TOLERANCE = float(os.environ.get('BENCHMARK_TOLERANCE', 1.5))
+# Differences below this are noise whatever the ratio, in ms or kb
+SLACK = {'import_ms': 50, 'invoke_ms': 50, 'max_rss_kb': 8192}
+UPDATE = os.environ.get('BENCHMARK_UPDATE') == '1'
+HANDLERS = ['src.custom_resource', 'src.rotation']
+REQUESTS = ['Create', 'Update', 'Delete']
+# Modules listed in the import breakdown
+TOP_MODULES = 15
+
+RESULTS = {}
+
+
+def python(*args):
+    """Run a fresh interpreter from the repository root and return its output"""
+    res = subprocess.run(
+        [sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True,
+        env={'AWS_DEFAULT_REGION': 'us-east-1', **os.environ},
+    )
+    return res
+
+
+def cold_start(resource_type, request_type):
+    """Median measurements of a cold invocation over RUNS processes"""
+    runs = []
+    for _ in range(RUNS):
+        res = python('-m', 'tests.benchmark.coldstart', resource_type, request_type)
+        runs.append(json.loads(res.stdout.strip().splitlines()[-1]))
+    return {metric: statistics.median(run[metric] for run in runs) for metric in runs[0]}
+
+
+def check(name, measured):
+    """Record a measurement and compare it to the baseline"""
+    RESULTS[name] = measured
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    if UPDATE or name not in baseline:
+        pytest.skip(f'no baseline for {name}, run with BENCHMARK_UPDATE=1 to record one')
+    regressions = [
+        f'{metric}: {value:.1f} against a baseline of {baseline[name][metric]:.1f}'
+        for metric, value in measured.items()
+        if metric in baseline[name]
+        and value > baseline[name][metric] * TOLERANCE + SLACK.get(metric, 0)
+    ]
+    assert not regressions, f'{name} regressed: ' + ', '.join(regressions)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def write_baseline():
+    """Save every result as the new baseline when BENCHMARK_UPDATE=1"""
+    yield
+    if UPDATE and RESULTS:
+        rounded = {
+            name: {metric: round(value, 1) for metric, value in measured.items()}
+            for name, measured in RESULTS.items()
+        }
+        BASELINE.write_text(json.dumps(rounded, indent=2, sort_keys=True) + '\n')
+
+
+@pytest.mark.parametrize('handler', HANDLERS)
+def test_import_time(handler):
+    """Import time of each lambda handler, with the slowest modules"""
+    modules = import_times(handler)
+    slowest = sorted(modules.items(), key=lambda item: item[1]['self'], reverse=True)
+    print(f'\n{handler}: {modules[handler]["cumulative"]:.1f}ms')
+    for name, times in slowest[:TOP_MODULES]:
+        print(f'  {times["self"]:8.1f}ms self {times["cumulative"]:8.1f}ms cumulative  {name}')
+    check(f'import {handler}', {'import_ms': modules[handler]['cumulative']})
+
+
+@pytest.mark.parametrize('request_type', REQUESTS)
+@pytest.mark.parametrize('resource_type', sorted(PROPERTIES))
+def test_first_invocation(resource_type, request_type):
+    """Import plus first event of each resource and request type, with peak memory"""
+    measured = cold_start(resource_type, request_type)
+    print(f'\n{resource_type} {request_type}: ' + ', '.join(
+        f'{metric}={value:.1f}' for metric, value in measured.items()))
+    check(f'{resource_type} {request_type}', measured)
@@ -0,0 +1,158 @@
+"""
+Benchmarks of resource property validation for the three resource schemas
+
+Every document is validated with the compiled schemas and with cerberus
+alone. Throughput and the memory allocated by one validation are added
+to the benchmark's extra info and printed.
+
+    make benchmark target=/test_validation.py
+"""
+import tracemalloc
+from unittest.mock import patch
+import pytest
+
+from src import validation
+from src.validation import api, application, grant
+
+pytest.importorskip('pytest_benchmark')
+
+# Items in the lists of the worst case documents
+LARGE = 300
+# Nesting of the worst case client metadata
+DEPTH = 20
+
+
+def deep_metadata(depth):
+    """Client metadata nested depth documents deep, with a few values at every level"""
+    metadata = {'Leaf': 'value'}
+    for level in range(depth):
+        metadata = {f'Level{level}': metadata, f'Value{level}': str(level), 'Tags': ['a', 'b']}
+    return metadata
+
+
+def application_realistic():
+    """A single page application as most stacks declare it"""
+    return {
+        'Tenant': 'my-tenant.auth0.com',
+        'ServiceToken': 'arn:aws:lambda:us-east-1:123456789012:function:bench',
+        'Name': 'bench-app',
+        'Description': 'benchmark application',
+        'Type': 'spa',
+        'CallbackUrls': ['https://bench.example.com/callback', 'http://localhost:3000'],
+        'LogoutUrls': ['https://bench.example.com'],
+        'WebOrigins': ['https://bench.example.com'],
+        'JWTConfiguration': {'LifetimeInSeconds': '3600', 'Alg': 'RS256'},
+        'RefreshToken': {
+            'RotationType': 'rotating', 'ExpirationType': 'expiring', 'TokenLifetime': '86400'},
+        'GrantTypes': ['implicit', 'authorization_code', 'refresh_token'],
+        'OidcConformant': 'true',
+        'ClientMetadata': {'Team': 'bench', 'CostCenter': '1234'},
+        'AllowAdGroups': ['bench-users'],
+        'Connections': ['con_bench'],
+    }
+
+
+def application_worst():
+    """A native application with every list and document as large as we've seen them"""
+    return {
+        **application_realistic(),
+        'Type': 'native',
+        'CallbackUrls': [f'https://bench{i}.example.com/callback' for i in range(LARGE)],
+        'LogoutUrls': [f'https://bench{i}.example.com' for i in range(LARGE)],
+        'WebOrigins': [f'https://bench{i}.example.com' for i in range(LARGE)],
+        'AllowedOrigins': [f'https://bench{i}.example.com' for i in range(LARGE)],
+        'NativeSocialLogin': {'Apple': {'Enabled': True}, 'Facebook': {'Enabled': False}},
+        'Mobile': {
+            'Android': {
+                'AppPackageName': 'com.example.bench',
+                'Sha256CertFingerprints': [f'{i:064x}' for i in range(LARGE)],
+            },
+            'Ios': {'TeamId': 'BENCH', 'AppBundleIdentifier': 'com.example.bench'},
+        },
+        'ClientMetadata': deep_metadata(DEPTH),
+        'AllowAdGroups': [f'bench-group-{i}' for i in range(LARGE)],
+        'Connections': [f'con_{i}' for i in range(LARGE)],
+    }
+
+
+def application_invalid():
+    """The worst case application with one bad callback, only cerberus can reject it"""
+    document = application_worst()
+    document['CallbackUrls'][-1] = 5
+    return document
+
+
+def api_realistic():
+    """An api with a handful of scopes"""
+    return {
+        'Tenant': 'my-tenant.auth0.com',
+        'ServiceToken': 'arn:aws:lambda:us-east-1:123456789012:function:bench',
+        'Name': 'bench-api',
+        'Audience': 'https://bench.example.com/api',
+        'Scopes': ['read:bench', 'write:bench'],
+        'SigningAlg': 'RS256',
+        'TokenLifetime': '86400',
+        'AllowOfflineAccess': 'false',
+    }
+
+
+def api_worst():
+    """An api with hundreds of scopes"""
+    return {**api_realistic(), 'Scopes': [f'read:bench{i}' for i in range(LARGE)]}
+
+
+def grant_realistic():
+    """A grant of a couple of scopes"""
+    return {
+        'Tenant': 'my-tenant.auth0.com',
+        'ServiceToken': 'arn:aws:lambda:us-east-1:123456789012:function:bench',
+        'ApplicationId': 'bench-client',
+        'Audience': 'https://bench.example.com/api',
+        'Scope': ['read:bench', 'write:bench'],
+    }
+
+
+def grant_worst():
+    """A grant of hundreds of scopes"""
+    return {**grant_realistic(), 'Scope': [f'read:bench{i}' for i in range(LARGE)]}
+
+
+DOCUMENTS = {
+    'application-realistic': (application.auth0Validator, application_realistic),
+    'application-worst': (application.auth0Validator, application_worst),
+    'application-invalid': (application.auth0Validator, application_invalid),
+    'api-realistic': (api.auth0Validator, api_realistic),
+    'api-worst': (api.auth0Validator, api_worst),
+    'grant-realistic': (grant.auth0Validator, grant_realistic),
+    'grant-worst': (grant.auth0Validator, grant_worst),
+}
+
+
+def allocations(validate, document):
+    """Peak and retained memory of one validation, in bytes"""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = validate(document)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {'peak_bytes': peak - before, 'retained_bytes': retained - before}
+
+
+@pytest.mark.parametrize('engine', ['compiled', 'cerberus'])
+@pytest.mark.parametrize('case', DOCUMENTS)
+def test_validated(benchmark, case, engine):
+    """Validate each document with the compiled schemas and with cerberus alone"""
+    validator, make_document = DOCUMENTS[case]
+    document = make_document()
+    with patch.object(validation, 'COMPILED_VALIDATION', engine == 'compiled'):
+        expected = validator.validated(document)
+        benchmark.extra_info.update(allocations(validator.validated, document))
+        result = benchmark(validator.validated, document)
+    assert result == expected
+    assert (result is None) == case.endswith('invalid')
+    benchmark.extra_info['validations_per_second'] = round(1 / benchmark.stats.stats.mean)
+    print(f'\n{case} {engine}: ' + ', '.join(
+        f'{name}={value}' for name, value in benchmark.extra_info.items()))
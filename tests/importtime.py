@@ -0,0 +1,29 @@
+"""Import times of a module measured in a fresh interpreter with -X importtime"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+
+
+def import_times(module):
+    """
+    Import a module in a fresh interpreter from the repository root and
+    return the self and cumulative import time in ms of every module it loaded
+
+    Args:
+        module (str): dotted name of the module to import
+    """
+    res = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+        env={'AWS_DEFAULT_REGION': 'us-east-1', **os.environ},
+    )
+    modules = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = {'self': int(own) / 1000, 'cumulative': int(cumulative) / 1000}
+    return modules
@@ -0,0 +1,82 @@
+"""Tests for auth0/connections.py"""
+import threading
+import time
+from unittest.mock import MagicMock as Mock
+import pytest
+from src.auth0_provider import connections
+
+
+class FakeConnections():
+    """In memory connections endpoint"""
+
+    def __init__(self, enabled=None):
+        self.enabled = list(enabled or [])
+        self.gets = 0
+        self.updates = []
+
+    def get(self, conn_id, fields):  # pylint: disable=unused-argument
+        """Read the enabled clients"""
+        self.gets += 1
+        return {'enabled_clients': list(self.enabled)}
+
+    def update(self, conn_id, body):  # pylint: disable=unused-argument
+        """Write the enabled clients"""
+        self.updates.append(body['enabled_clients'])
+        self.enabled = list(body['enabled_clients'])
+
+
+def test_merge():
+    """Changes keep the existing order and are idempotent"""
+    assert connections.merge(['a', 'b'], {'c': True, 'a': False}) == ['b', 'c']
+    assert connections.merge(['a', 'b'], {'b': True, 'd': False}) == ['a', 'b']
+
+
+def test_change():
+    """A change is one read and one write"""
+    endpoint = FakeConnections(['a'])
+    members = connections.ConnectionMembers()
+    members.change(endpoint, 'con_1', 'b', True)
+    assert endpoint.enabled == ['a', 'b']
+    assert endpoint.gets == 1
+    assert endpoint.updates == [['a', 'b']]
+
+    # nothing to write when the connection already has the change
+    members.change(endpoint, 'con_1', 'b', True)
+    assert len(endpoint.updates) == 1
+    members.change(endpoint, 'con_1', 'b', False)
+    assert endpoint.enabled == ['a']
+    assert members.writes == 2
+
+
+def test_change_concurrent():
+    """Changes to one connection from the same container don't drop each other"""
+    endpoint = FakeConnections()
+    members = connections.ConnectionMembers()
+    barrier = threading.Barrier(5)
+    read = endpoint.get
+
+    def slow_get(*args):
+        # every thread would read the same list without the per connection lock
+        time.sleep(0.01)
+        return read(*args)
+
+    endpoint.get = slow_get
+
+    def change(app_id):
+        barrier.wait()
+        members.change(endpoint, 'con_1', app_id, True)
+    threads = [threading.Thread(target=change, args=(f'app{i}',)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(endpoint.enabled) == [f'app{i}' for i in range(5)]
+
+
+def test_change_error():
+    """Errors of the read or write are raised to the caller"""
+    endpoint = Mock()
+    endpoint.get.side_effect = Exception('auth0 is down')
+    with pytest.raises(Exception, match='auth0 is down'):
+        connections.ConnectionMembers().change(endpoint, 'con_1', 'b', True)
+    endpoint.update.assert_not_called()
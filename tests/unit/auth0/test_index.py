@@ -2,12 +2,12 @@
 """Tests for auth0/index.py"""
 from unittest.mock import patch, MagicMock as Mock
 import pytest
+from auth0.v3.exceptions import Auth0Error
 from src.auth0_provider.index import Auth0Provider
-from src.auth0_provider import index
 
 
 @pytest.fixture(name='fake_auth0')
-@patch('src.auth0_provider.index.boto3')
+@patch('src.auth0_provider.index.clients')
 @patch('src.auth0_provider.index.secret')
 @patch('src.auth0_provider.index.Auth0Provider.authenticate')
 def fixture_fake_auth0(_, secret, boto):
@@ -16,7 +16,7 @@ def fixture_fake_auth0(_, secret, boto):
     Fixture is used to call object methods in below tests
     """
     secrets = Mock()
-    boto.client.return_value = secrets
+    boto.get_client.return_value = secrets
     secret.get_secret.return_value = (
         '{"tenant": "my-tenant.auth0.com", "AUTH0_CLIENT_ID": "asdlfwo30a", '
         '"AUTH0_CLIENT_SECRET": "2029nvlda0:#--9D(1nvl1"}'
@@ -43,6 +43,21 @@ def test_authenticate(auth0_obj, get_token, fake_auth0):
     auth0_obj.assert_called_with(domain, access_token)
 
 
+@patch('src.auth0_provider.index.GetToken')
+@patch('src.auth0_provider.index.Auth0')
+def test_authenticate_cached(auth0_obj, get_token, fake_auth0):
+    """Test authenticate reuses the management token in a warm container"""
+    get_token().client_credentials.return_value = {
+        'access_token': 'access_token', 'expires_in': 86400}
+    domain = 'my-tenant.auth0.com'
+
+    fake_auth0.authenticate(domain, 'client_id', 'secret')
+    fake_auth0.authenticate(domain, 'client_id', 'secret')
+    assert get_token().client_credentials.call_count == 1
+    auth0_obj.assert_called_with(domain, 'access_token')
+    assert fake_auth0.is_authenticated()
+
+
 def test_resource(fake_auth0):
     """Test for creating a resource"""
     url = 'url.mmm.com'
@@ -64,34 +79,61 @@ def test_resource(fake_auth0):
     assert grant_id == g_id
 
 
-@patch('src.auth0_provider.index.time')
-def test_get_resource_server(_, fake_auth0):
-    """Test for get_resource_server"""
+def test_get_resource_server(fake_auth0):
+    """Test for get_resource_server looking the audience up directly"""
+    url = 'https://url.mmm.com/api'
+    fake_auth0.auth0.resource_servers.get.return_value = {'identifier': url, 'id': 'server_id'}
+    assert fake_auth0.get_resource_server(url) == 'server_id'
+    fake_auth0.auth0.resource_servers.get.assert_called_with('https%3A%2F%2Furl.mmm.com%2Fapi')
+    fake_auth0.auth0.resource_servers.get_all.assert_not_called()
+
+    fake_auth0.auth0.resource_servers.get.side_effect = Auth0Error(
+        404, 'inexistent_resource_server', 'The resource server does not exist')
+    assert fake_auth0.get_resource_server(url) is None
+    fake_auth0.auth0.resource_servers.get_all.assert_not_called()
+
+
+def test_get_resource_server_scan(fake_auth0):
+    """Test for get_resource_server falling back to a paged scan"""
     url = 'url.mmm.com'
     server_id = 'server_id'
-    fake_auth0.auth0.resource_servers.get_all.side_effect = [
-        [{'identifier': 'wrong.url.com'}],
-        [{'identifier': url, 'id': server_id}]
+    fake_auth0.auth0.resource_servers.get.side_effect = Auth0Error(
+        400, 'invalid_uri', 'Path validation error')
+    client = fake_auth0.auth0.resource_servers.client
+    client.get.side_effect = [
+        {'resource_servers': [{'identifier': 'wrong.url.com'}] * 50, 'total': 51},
+        {'resource_servers': [{'identifier': url, 'id': server_id}], 'total': 51},
     ]
     assert server_id == fake_auth0.get_resource_server(url)
-    fake_auth0.auth0.resource_servers.get_all.assert_called_with(
-        page=1, per_page=50)
+    assert client.get.call_args[1]['params']['page'] == 1
 
-    fake_auth0.auth0.resource_servers.get_all.side_effect = [
-        [{'identifier': 'wrong.url.com'}],
-        []
+    client.get.side_effect = [
+        {'resource_servers': [{'identifier': 'wrong.url.com'}], 'total': 1},
     ]
     assert fake_auth0.get_resource_server(url) is None
 
-    fake_auth0.auth0.resource_servers.get_all.side_effect = [
-        [{'identifier': 'wrong.url.com'}],
-        [{'identifier': 'wrong.url.com'}],
-    ]
-    assert fake_auth0.get_resource_server(url) is None
 
-    fake_auth0.auth0.resource_servers.get_all.side_effect = [
-        [{'identifier': i}] for i in range(index.PAGE_LIMIT+1)]
-    assert fake_auth0.get_resource_server(url) is None
+def test_iter_lists(fake_auth0):
+    """Every list is streamed from its own endpoint"""
+    fake_auth0.auth0.clients.client.get.return_value = {
+        'clients': [{'client_id': 'foo'}], 'total': 1}
+    assert list(fake_auth0.iter_clients(fields=['client_id'])) == [{'client_id': 'foo'}]
+    params = fake_auth0.auth0.clients.client.get.call_args[1]['params']
+    assert params['fields'] == 'client_id'
+
+    fake_auth0.auth0.resource_servers.client.get.return_value = {
+        'resource_servers': [{'id': 'foo'}], 'total': 1}
+    assert list(fake_auth0.iter_resource_servers()) == [{'id': 'foo'}]
+
+    fake_auth0.auth0.client_grants.client.get.return_value = {
+        'client_grants': [{'id': 'foo'}], 'next': None}
+    assert list(fake_auth0.iter_client_grants()) == [{'id': 'foo'}]
+    assert 'take' in fake_auth0.auth0.client_grants.client.get.call_args[1]['params']
+
+    fake_auth0.auth0.connections.client.get.return_value = {
+        'connections': [{'id': 'foo'}], 'next': None}
+    assert list(fake_auth0.iter_connections()) == [{'id': 'foo'}]
+
 
 def test_rotate_client_secret(fake_auth0):
     """Test for rotate_client_secret"""
@@ -116,3 +158,48 @@ def test_delete_resource(fake_auth0):
     fake_auth0.delete_resource(resource_id, client_id)
     fake_auth0.auth0.clients.delete.assert_called_with(client_id)
     fake_auth0.auth0.resource_servers.delete.assert_called_with(resource_id)
+
+
+def test_add_remove_connection(fake_auth0):
+    """Connection membership goes through the coalescing writer"""
+    connections = fake_auth0.auth0.connections
+    connections.get.side_effect = [
+        {'enabled_clients': ['a']},
+        {'enabled_clients': ['a', 'app']},
+        {'enabled_clients': ['a', 'app']},
+        {'enabled_clients': ['a']},
+    ]
+    fake_auth0.add_to_connection('con_1', 'app')
+    connections.update.assert_called_with('con_1', {'enabled_clients': ['a', 'app']})
+    fake_auth0.remove_from_connection('con_1', 'app')
+    connections.update.assert_called_with('con_1', {'enabled_clients': ['a']})
+
+
+def test_unauthorized(fake_auth0):
+    """Test a rejected token is handed to the handler once per token"""
+    assert fake_auth0.unauthorized('old') is None
+
+    def reauthorize(provider, _):
+        provider.token = {'access_token': 'new'}
+        return 'new'
+    fake_auth0.on_unauthorized = Mock(side_effect=reauthorize)
+    fake_auth0.token = {'access_token': 'old'}
+    assert fake_auth0.unauthorized('old') == 'new'
+    fake_auth0.on_unauthorized.assert_called_once_with(fake_auth0, 'old')
+
+    # a call that still used the old token picks up the new one
+    assert fake_auth0.unauthorized('old') == 'new'
+    assert fake_auth0.on_unauthorized.call_count == 1
+
+
+@patch('src.auth0_provider.index.clients')
+@patch('src.auth0_provider.index.Auth0Provider.authenticate')
+def test_refresh_reads_current_secret(authenticate, boto):
+    """Test the management credentials are read from the AWSCURRENT stage"""
+    secrets = boto.get_client.return_value
+    secrets.get_secret_value.return_value = {'SecretString': (
+        '{"AUTH0_CLIENT_ID": "client_id", "AUTH0_CLIENT_SECRET": "client_secret"}')}
+    Auth0Provider('management-secret', 'my-tenant.auth0.com')
+    secrets.get_secret_value.assert_called_once_with(
+        SecretId='management-secret', VersionStage='AWSCURRENT')
+    authenticate.assert_called_with('my-tenant.auth0.com', 'client_id', 'client_secret')
@@ -0,0 +1,98 @@
+"""Tests for auth0/pagination.py"""
+from unittest.mock import MagicMock as Mock
+from src.auth0_provider import pagination
+
+
+def endpoint(*responses):
+    """Build a fake sdk endpoint answering with responses in order"""
+    fake = Mock()
+    fake._url.return_value = 'https://my-tenant.auth0.com/api/v2/things'  # pylint: disable=protected-access
+    fake.client.get.side_effect = list(responses)
+    return fake
+
+
+def sent(fake):
+    """Query parameters of every request sent to a fake endpoint"""
+    return [call[1]['params'] for call in fake.client.get.call_args_list]
+
+
+def test_iterate_pages():
+    """Pages are requested until the total is reached"""
+    fake = endpoint(
+        {'things': [1, 2], 'total': 3},
+        {'things': [3], 'total': 3},
+    )
+    records = pagination.iterate(fake, 'things', fields=['id', 'name'], per_page=2)
+    # nothing is requested until the first record is needed
+    fake.client.get.assert_not_called()
+    assert list(records) == [1, 2, 3]
+    assert sent(fake) == [
+        {'page': 0, 'per_page': 2, 'include_totals': 'true',
+         'fields': 'id,name', 'include_fields': 'true'},
+        {'page': 1, 'per_page': 2, 'include_totals': 'true',
+         'fields': 'id,name', 'include_fields': 'true'},
+    ]
+
+
+def test_iterate_pages_stops():
+    """A full last page ends the scan without requesting an empty page"""
+    fake = endpoint({'things': [1, 2], 'total': 2})
+    assert list(pagination.iterate(fake, 'things', per_page=2)) == [1, 2]
+
+    fake = endpoint({'things': [1, 2], 'total': 5}, {'things': [], 'total': 5})
+    assert list(pagination.iterate(fake, 'things', per_page=2)) == [1, 2]
+
+    fake = endpoint(*[{'things': [1]} for _ in range(pagination.PAGE_LIMIT + 1)])
+    assert len(list(pagination.iterate(fake, 'things', per_page=1))) == pagination.PAGE_LIMIT
+
+
+def test_iterate_checkpoint():
+    """Checkpoint pagination follows next until it runs out"""
+    fake = endpoint(
+        {'things': [1, 2], 'next': 'abc'},
+        {'things': [3], 'next': None},
+    )
+    assert list(pagination.iterate(fake, 'things', per_page=2, checkpoint=True)) == [1, 2, 3]
+    assert sent(fake) == [{'take': 2}, {'take': 2, 'from': 'abc'}]
+
+
+def test_iterate_checkpoint_unsupported():
+    """Endpoints that ignore from/take are read with page numbers instead"""
+    fake = endpoint(
+        [1, 2],
+        {'things': [1, 2], 'total': 2},
+    )
+    assert list(pagination.iterate(fake, 'things', per_page=2, checkpoint=True)) == [1, 2]
+    assert sent(fake)[1]['page'] == 0
+
+
+def test_iterate_pages_concurrent():
+    """Pages after the first are fetched on the pool and yielded in order"""
+    pages = {page: {'things': [page * 2, page * 2 + 1], 'total': 9} for page in range(4)}
+    pages[4] = {'things': [8], 'total': 9}
+    fake = Mock()
+    fake.client.get.side_effect = lambda url, params: pages[params['page']]
+    records = pagination.iterate(fake, 'things', per_page=2, workers=3)
+    assert list(records) == list(range(9))
+    assert sorted(params['page'] for params in sent(fake)) == [0, 1, 2, 3, 4]
+
+
+def test_iterate_pages_concurrent_without_total():
+    """Without a total the remaining pages are read one at a time"""
+    fake = endpoint({'things': [1, 2]}, {'things': [3]})
+    assert list(pagination.iterate(fake, 'things', per_page=2, workers=3)) == [1, 2, 3]
+
+    fake = endpoint({'things': [1], 'total': 1})
+    assert list(pagination.iterate(fake, 'things', per_page=2, workers=3)) == [1]
+    assert fake.client.get.call_count == 1
+
+
+def test_iterate_pages_concurrent_stops_early():
+    """Closing the iterator doesn't wait for pages that were never started"""
+    fake = Mock()
+    fake.client.get.side_effect = lambda url, params: {'things': [params['page']], 'total': 50}
+    records = pagination.iterate(fake, 'things', per_page=1, workers=2)
+    assert next(records) == 0
+    assert next(records) == 1
+    records.close()
+    assert fake.client.get.call_count < 10
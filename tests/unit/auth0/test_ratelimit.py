@@ -0,0 +1,74 @@
+"""Tests for auth0/ratelimit.py"""
+from unittest.mock import patch
+from src.auth0_provider import ratelimit
+from src.auth0_provider.ratelimit import RateLimiter
+
+
+def headers(limit, remaining, reset):
+    """rate limit headers as auth0 sends them"""
+    return {
+        'x-ratelimit-limit': str(limit),
+        'x-ratelimit-remaining': str(remaining),
+        'x-ratelimit-reset': str(reset),
+    }
+
+
+def test_full_speed_without_budget_info():
+    """Nothing is throttled before auth0 reports a budget"""
+    limiter = RateLimiter()
+    assert limiter.delay(now=0) == 0
+    limiter.update(200, {})
+    assert limiter.delay(now=0) == 0
+
+
+def test_full_speed_while_budget_remains():
+    """Requests are not delayed while more than the reserve is left"""
+    limiter = RateLimiter(reserve=5)
+    limiter.update(200, headers(50, 20, 100))
+    assert [limiter.delay(now=90) for _ in range(15)] == [0] * 15
+
+
+def test_slows_down_near_the_limit():
+    """The last requests of a window are spread over what is left of it"""
+    limiter = RateLimiter(reserve=5)
+    limiter.update(200, headers(50, 3, 100))
+    assert limiter.delay(now=92) == 2
+    assert limiter.delay(now=92) == 8 / 3
+    assert limiter.delay(now=92) == 4
+    # exhausted, wait for the reset
+    assert limiter.delay(now=92) == 8
+
+
+def test_window_reset():
+    """The bucket refills once the window has reset"""
+    limiter = RateLimiter(reserve=5)
+    limiter.update(200, headers(50, 0, 100))
+    assert limiter.delay(now=101) == 0
+    assert limiter.remaining == 49
+
+
+def test_rate_limited():
+    """A 429 empties the bucket until the reset, capped at max_wait"""
+    limiter = RateLimiter(max_wait=10)
+    limiter.update(429, headers(50, 0, 100))
+    assert limiter.delay(now=95) == 5
+    limiter.update(429, headers(50, 0, 100))
+    assert limiter.delay(now=50) == 10
+
+
+@patch('src.auth0_provider.ratelimit.time')
+def test_acquire(mock_time):
+    """acquire sleeps for the computed delay"""
+    mock_time.time.return_value = 95
+    limiter = RateLimiter()
+    limiter.update(429, headers(50, 0, 100))
+    limiter.acquire()
+    mock_time.sleep.assert_called_with(5)
+    assert limiter.throttled == 1
+
+
+def test_get_limiter():
+    """Limiters are kept per tenant"""
+    tenant_a = ratelimit.get_limiter('a.auth0.com')
+    assert ratelimit.get_limiter('a.auth0.com') is tenant_a
+    assert ratelimit.get_limiter('b.auth0.com') is not tenant_a
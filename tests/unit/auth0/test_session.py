@@ -0,0 +1,153 @@
+"""Tests for auth0/session.py"""
+import time
+from unittest.mock import patch, MagicMock as Mock
+import pytest
+import requests
+from auth0.v3.authentication import GetToken
+from auth0.v3.exceptions import Auth0Error, RateLimitError
+from auth0.v3.management import Auth0
+from src.auth0_provider import session
+
+
+def response(status_code=200, text='{"id": "foo"}'):
+    """Build a fake requests response"""
+    res = Mock()
+    res.status_code = status_code
+    res.text = text
+    res.headers = {}
+    return res
+
+
+def test_get_session():
+    """The session is created once per container and pools connections"""
+    first = session.get_session()
+    assert session.get_session() is first
+    adapter = first.get_adapter('https://my-tenant.auth0.com')
+    assert adapter._pool_maxsize == session.POOL_SIZE  # pylint: disable=protected-access
+
+
+@patch('src.auth0_provider.session.get_session')
+def test_session_rest_client(get_session):
+    """Every method goes over the shared session with the configured timeouts"""
+    get_session().request.return_value = response()
+    client = session.SessionRestClient(jwt='token', options=session.rest_options())
+    url = 'https://my-tenant.auth0.com/api/v2/clients'
+
+    assert client.get(url, params={'page': 0}) == {'id': 'foo'}
+    method, called_url = get_session().request.call_args[0]
+    kwargs = get_session().request.call_args[1]
+    assert (method, called_url) == ('GET', url)
+    assert kwargs['params'] == {'page': 0}
+    assert kwargs['headers']['Authorization'] == 'Bearer token'
+    assert kwargs['timeout'] == (session.CONNECT_TIMEOUT, session.READ_TIMEOUT)
+
+    client.post(url, data={'name': 'foo'})
+    assert get_session().request.call_args[0][0] == 'POST'
+    assert get_session().request.call_args[1]['json'] == {'name': 'foo'}
+    client.patch(url, data={'name': 'bar'})
+    assert get_session().request.call_args[0][0] == 'PATCH'
+    client.put(url, data={'name': 'bar'})
+    assert get_session().request.call_args[0][0] == 'PUT'
+    client.delete(url)
+    assert get_session().request.call_args[0][0] == 'DELETE'
+    client.file_post(url, data={}, files={})
+    assert get_session().request.call_args[1]['headers']['Content-Type'] is None
+
+
+@patch('src.utils.retry.time.sleep')
+@patch('src.auth0_provider.session.get_session')
+def test_session_rest_client_rate_limit(get_session, sleep):
+    """Rate limited calls are retried once the window resets"""
+    limited = response(429, '{}')
+    limited.headers = {'x-ratelimit-reset': str(int(time.time()) + 2)}
+    get_session().request.side_effect = [limited, response()]
+    client = session.SessionRestClient(jwt='token', options=session.rest_options())
+    assert client.post('https://my-tenant.auth0.com/api/v2/clients') == {'id': 'foo'}
+    assert get_session().request.call_count == 2
+    assert 0 < sleep.call_args[0][0] <= 2
+
+
+@patch('src.utils.retry.time.sleep', Mock())
+@patch('src.auth0_provider.session.get_session')
+def test_session_rest_client_retries(get_session):
+    """Server errors are only retried for idempotent methods"""
+    client = session.SessionRestClient(jwt='token', options=session.rest_options())
+    url = 'https://my-tenant.auth0.com/api/v2/clients'
+
+    get_session().request.side_effect = [response(503, '{}'), response()]
+    assert client.patch(url, data={}) == {'id': 'foo'}
+
+    get_session().request.side_effect = [response(503, '{"message": "down"}'), response()]
+    with pytest.raises(Auth0Error):
+        client.post(url, data={})
+
+    get_session().request.side_effect = [requests.ConnectTimeout(), response()]
+    assert client.post(url, data={}) == {'id': 'foo'}
+
+    get_session().request.side_effect = [requests.ReadTimeout(), response()]
+    with pytest.raises(requests.ReadTimeout):
+        client.post(url, data={})
+
+    get_session().request.side_effect = [requests.ReadTimeout(), response()]
+    assert client.delete(url) == {'id': 'foo'}
+
+    get_session().request.reset_mock(side_effect=True)
+    get_session().request.return_value = response(429, '{}')
+    with pytest.raises(RateLimitError):
+        client.get(url)
+    assert get_session().request.call_count == session.RETRY.max_attempts
+
+
+@patch('src.auth0_provider.session.get_session')
+def test_session_rest_client_unauthorized(get_session):
+    """A rejected token is replaced and the request sent once more"""
+    client = session.SessionRestClient(jwt='old', options=session.rest_options())
+    url = 'https://my-tenant.auth0.com/api/v2/clients'
+
+    get_session().request.side_effect = [response(401, '{}'), response()]
+    with pytest.raises(Auth0Error):
+        client.get(url)
+
+    client.unauthorized = Mock(return_value='new')
+    get_session().request.side_effect = [response(401, '{}'), response()]
+    assert client.post(url, data={}) == {'id': 'foo'}
+    client.unauthorized.assert_called_once_with('old')
+    assert get_session().request.call_args[1]['headers']['Authorization'] == 'Bearer new'
+
+    # only retried once
+    get_session().request.side_effect = [response(401, '{}'), response(401, '{}')]
+    with pytest.raises(Auth0Error):
+        client.get(url)
+    assert client.unauthorized.call_count == 2
+
+    client.unauthorized = Mock(return_value=None)
+    get_session().request.side_effect = [response(401, '{}'), response()]
+    with pytest.raises(Auth0Error):
+        client.get(url)
+
+
+def test_wait_hint():
+    """Retry-After wins over the rate limit reset"""
+    assert session.wait_hint({}) == 0
+    assert session.wait_hint({'retry-after': '3'}) == 3
+    assert 0 < session.wait_hint({'x-ratelimit-reset': str(int(time.time()) + 2)}) <= 2
+    assert session.wait_hint({'x-ratelimit-reset': '0'}) == 0
+
+
+def test_use_sessions():
+    """Every management endpoint and GetToken are pointed at the session"""
+    auth0 = session.use_sessions(Auth0('my-tenant.auth0.com', 'token'), 'token')
+    for name in ['clients', 'client_grants', 'connections', 'resource_servers', 'users']:
+        client = getattr(auth0, name).client
+        assert isinstance(client, session.SessionRestClient)
+        assert client.jwt == 'token'
+        assert client.unauthorized is None
+
+    unauthorized = Mock()
+    auth0 = session.use_sessions(Auth0('my-tenant.auth0.com', 'token'), 'token', unauthorized)
+    assert auth0.clients.client.unauthorized is unauthorized
+
+    get_token = session.use_session(GetToken('my-tenant.auth0.com'))
+    assert isinstance(get_token.client, session.SessionRestClient)
+    # retries are handled by session.RETRY, not the sdk
+    assert get_token.client.options.retries == 0
@@ -0,0 +1,169 @@
+"""Tests for auth0/store.py"""
+import json
+import os
+import stat
+import threading
+import time
+from unittest.mock import MagicMock as Mock
+import pytest
+from botocore.exceptions import ClientError
+
+from src.auth0_provider.store import (
+    FileTokenStore, MemoryTokenStore, SSMTokenStore, TokenStore
+)
+
+TOKEN = {'access_token': 'token', 'expires_at': 1234}
+
+
+@pytest.mark.parametrize('store_type', ['memory', 'file'])
+def test_local_stores(store_type, tmp_path):
+    """Test the in-memory and file stores share the same semantics"""
+    store = MemoryTokenStore() if store_type == 'memory' else FileTokenStore(str(tmp_path))
+    key = 'my-tenant.auth0.com/client_id'
+
+    assert store.get(key) is None
+    store.put(key, TOKEN)
+    assert store.get(key) == TOKEN
+
+    assert store.acquire(key)
+    assert not store.acquire(key)
+    store.release(key)
+    assert store.acquire(key)
+    store.release(key)
+    store.release(key)
+
+    # abandoned locks expire
+    assert store.acquire(key, ttl=-1)
+    assert store.acquire(key)
+
+
+def test_token_store_interface():
+    """Test stores have to implement the whole interface"""
+    with pytest.raises(TypeError):
+        TokenStore()  # pylint: disable=abstract-class-instantiated
+
+
+def test_file_store_private(tmp_path):
+    """Test the token and lock files are only readable by their owner"""
+    store = FileTokenStore(str(tmp_path))
+    key = 'my-tenant.auth0.com/client_id'
+    store.put(key, TOKEN)
+    store.put(key, TOKEN)
+    assert store.acquire(key)
+    files = os.listdir(tmp_path)
+    assert len(files) == 2
+    for name in files:
+        assert stat.S_IMODE(os.stat(tmp_path / name).st_mode) == 0o600
+
+
+def test_file_store_takeover(tmp_path):
+    """Test only one of many writers takes over an expired lock"""
+    store = FileTokenStore(str(tmp_path))
+    key = 'my-tenant.auth0.com/client_id'
+    assert store.acquire(key, ttl=-1)
+
+    barrier = threading.Barrier(8)
+    results = []
+
+    def take():
+        barrier.wait()
+        results.append(store.acquire(key))
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+
+
+def test_file_store_release_owner(tmp_path):
+    """Test a lock taken over by someone else is not released"""
+    store = FileTokenStore(str(tmp_path))
+    key = 'my-tenant.auth0.com/client_id'
+    assert store.acquire(key, ttl=-1)
+    other = threading.Thread(target=store.acquire, args=(key,))
+    other.start()
+    other.join()
+
+    store.release(key)
+    assert not store.acquire(key)
+
+
+def test_ssm_store():
+    """Test the ssm parameter store backend"""
+    client = Mock()
+    store = SSMTokenStore(prefix='/qa/auth0/tokens', client=client)
+    key = 'my-tenant.auth0.com/client_id'
+
+    client.get_parameter.side_effect = ClientError(
+        {'Error': {'Code': 'ParameterNotFound'}}, 'get_parameter')
+    assert store.get(key) is None
+
+    client.get_parameter.side_effect = None
+    client.get_parameter.return_value = {'Parameter': {'Value': json.dumps(TOKEN)}}
+    assert store.get(key) == TOKEN
+    client.get_parameter.assert_called_with(
+        Name='/qa/auth0/tokens/my-tenant.auth0.com/client_id', WithDecryption=True)
+
+    store.put(key, TOKEN)
+    client.put_parameter.assert_called_with(
+        Name='/qa/auth0/tokens/my-tenant.auth0.com/client_id',
+        Value=json.dumps(TOKEN),
+        Type='SecureString',
+        Overwrite=True,
+        Tier='Intelligent-Tiering',
+    )
+
+    client.get_parameter.side_effect = ClientError(
+        {'Error': {'Code': 'AccessDeniedException'}}, 'get_parameter')
+    with pytest.raises(ClientError):
+        store.get(key)
+
+
+def test_ssm_store_lock():
+    """Test the ssm lock is taken with a conditional put"""
+    client = Mock()
+    store = SSMTokenStore(prefix='/qa/auth0/tokens', client=client)
+    key = 'my-tenant.auth0.com/client_id'
+    lock = '/qa/auth0/tokens/my-tenant.auth0.com/client_id-lock'
+
+    assert store.acquire(key)
+    assert client.put_parameter.call_args[1]['Overwrite'] is False
+
+    client.put_parameter.side_effect = [
+        ClientError({'Error': {'Code': 'ParameterAlreadyExists'}}, 'put_parameter'),
+    ]
+    client.get_parameter.return_value = {'Parameter': {'Value': str(time.time() + 30)}}
+    assert not store.acquire(key)
+
+    # a lock left behind by a dead container is taken over
+    client.put_parameter.side_effect = [
+        ClientError({'Error': {'Code': 'ParameterAlreadyExists'}}, 'put_parameter'),
+        {'Version': 4},
+    ]
+    client.get_parameter.return_value = {
+        'Parameter': {'Value': str(time.time() - 1), 'Version': 3}}
+    assert store.acquire(key)
+    assert client.put_parameter.call_args[1]['Overwrite'] is True
+
+    # another container overwrote the expired lock first
+    client.put_parameter.side_effect = [
+        ClientError({'Error': {'Code': 'ParameterAlreadyExists'}}, 'put_parameter'),
+        {'Version': 5},
+    ]
+    assert not store.acquire(key)
+
+    # the lock was released between the put and the read
+    client.put_parameter.side_effect = [
+        ClientError({'Error': {'Code': 'ParameterAlreadyExists'}}, 'put_parameter'),
+    ]
+    client.get_parameter.side_effect = ClientError(
+        {'Error': {'Code': 'ParameterNotFound'}}, 'get_parameter')
+    assert not store.acquire(key)
+    client.get_parameter.side_effect = None
+
+    store.release(key)
+    client.delete_parameter.assert_called_with(Name=lock)
+    client.delete_parameter.side_effect = ClientError(
+        {'Error': {'Code': 'ParameterNotFound'}}, 'delete_parameter')
+    store.release(key)
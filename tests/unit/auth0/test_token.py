@@ -0,0 +1,171 @@
+"""Tests for auth0/token.py"""
+import threading
+import time
+from unittest.mock import patch, MagicMock as Mock
+from src.auth0_provider.store import MemoryTokenStore
+from src.auth0_provider.token import TokenCache
+
+
+def test_get_caches_token():
+    """A fresh token is fetched once and then served from the cache"""
+    cache = TokenCache(margin=60)
+    fetch = Mock(return_value={'access_token': 'token', 'expires_in': 86400})
+
+    for _ in range(40):
+        token = cache.get('my-tenant.auth0.com', 'client_id', fetch)
+        assert token['access_token'] == 'token'
+
+    assert fetch.call_count == 1
+    assert cache.misses == 1
+    assert cache.hits == 39
+
+
+def test_get_keyed_by_tenant_and_client():
+    """Tokens are not shared between tenants or management clients"""
+    cache = TokenCache()
+    fetch = Mock(return_value={'access_token': 'token', 'expires_in': 86400})
+
+    cache.get('tenant-a.auth0.com', 'client_id', fetch)
+    cache.get('tenant-b.auth0.com', 'client_id', fetch)
+    cache.get('tenant-a.auth0.com', 'other_client', fetch)
+    assert fetch.call_count == 3
+
+    cache.invalidate('tenant-a.auth0.com')
+    cache.get('tenant-b.auth0.com', 'client_id', fetch)
+    assert fetch.call_count == 3
+    cache.get('tenant-a.auth0.com', 'client_id', fetch)
+    assert fetch.call_count == 4
+
+
+def test_get_refresh_does_not_block_hits():
+    """A slow refresh only holds up the threads waiting on the same token"""
+    cache = TokenCache()
+    fetch = Mock(return_value={'access_token': 'token', 'expires_in': 86400})
+    cache.get('tenant-b.auth0.com', 'client_id', fetch)
+
+    started = threading.Event()
+    finish = threading.Event()
+
+    def slow_fetch():
+        started.set()
+        finish.wait(5)
+        return {'access_token': 'slow', 'expires_in': 86400}
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            cache.get('tenant-a.auth0.com', 'client_id', slow_fetch)))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    assert started.wait(5)
+    # a cached token of another tenant is served during the refresh
+    assert cache.get('tenant-b.auth0.com', 'client_id', fetch)['access_token'] == 'token'
+    assert not finish.is_set()
+    finish.set()
+    for thread in threads:
+        thread.join()
+    # the threads waiting on the refresh got its token instead of fetching again
+    assert [token['access_token'] for token in results] == ['slow'] * 3
+    assert fetch.call_count == 1
+    assert cache.misses == 2
+
+
+@patch('src.auth0_provider.token.time')
+def test_get_refreshes_before_expiry(mock_time):
+    """A token inside the safety margin is refreshed proactively"""
+    cache = TokenCache(margin=300)
+    fetch = Mock(side_effect=[
+        {'access_token': 'first', 'expires_in': 1000},
+        {'access_token': 'second', 'expires_in': 1000},
+    ])
+    mock_time.time.return_value = 0
+    assert cache.get('tenant', 'client_id', fetch)['access_token'] == 'first'
+
+    mock_time.time.return_value = 699
+    assert cache.get('tenant', 'client_id', fetch)['access_token'] == 'first'
+
+    mock_time.time.return_value = 700
+    assert cache.get('tenant', 'client_id', fetch)['access_token'] == 'second'
+    assert fetch.call_count == 2
+
+
+def test_get_without_expiry():
+    """Tokens without an expires_in are never served from the cache"""
+    cache = TokenCache()
+    fetch = Mock(return_value={'access_token': 'token'})
+    cache.get('tenant', 'client_id', fetch)
+    cache.get('tenant', 'client_id', fetch)
+    assert fetch.call_count == 2
+    assert cache.hits == 0
+
+
+def test_reject():
+    """A rejected token is fetched again, even when the store still holds it"""
+    store = MemoryTokenStore()
+    fetch = Mock(return_value={'access_token': 'old', 'expires_in': 86400})
+    cache = TokenCache(store=store)
+    cache.get('tenant', 'client_id', fetch)
+
+    cache.reject('tenant', 'old')
+    fetch.return_value = {'access_token': 'new', 'expires_in': 86400}
+    assert cache.get('tenant', 'client_id', fetch)['access_token'] == 'new'
+    assert store.get('tenant/client_id')['access_token'] == 'new'
+    assert fetch.call_count == 2
+
+
+def test_get_shared_store():
+    """A second container picks up the token stored by the first"""
+    store = MemoryTokenStore()
+    fetch = Mock(return_value={'access_token': 'token', 'expires_in': 86400})
+
+    TokenCache(store=store).get('tenant', 'client_id', fetch)
+    cache = TokenCache(store=store)
+    assert cache.get('tenant', 'client_id', fetch)['access_token'] == 'token'
+    assert cache.get('tenant', 'client_id', fetch)['access_token'] == 'token'
+    assert fetch.call_count == 1
+    assert cache.shared_hits == 1
+    assert cache.hits == 1
+
+
+def test_get_shared_single_flight():
+    """Only the lock holder refreshes, others use the unexpired token"""
+    store = MemoryTokenStore()
+    store.put('tenant/client_id', {'access_token': 'old', 'expires_at': time.time() + 60})
+    store.acquire('tenant/client_id')
+    fetch = Mock(return_value={'access_token': 'new', 'expires_in': 86400})
+
+    cache = TokenCache(store=store)
+    assert cache.get('tenant', 'client_id', fetch)['access_token'] == 'old'
+    fetch.assert_not_called()
+
+    store.release('tenant/client_id')
+    cache = TokenCache(store=store)
+    assert cache.get('tenant', 'client_id', fetch)['access_token'] == 'new'
+    assert store.get('tenant/client_id')['access_token'] == 'new'
+    # the lock is released after the refresh
+    assert store.acquire('tenant/client_id')
+
+
+@patch('src.auth0_provider.token.REFRESH_WAIT', 0)
+def test_get_shared_wait_timeout():
+    """Refresh directly when the lock holder never stores a token"""
+    store = MemoryTokenStore()
+    store.acquire('tenant/client_id')
+    fetch = Mock(return_value={'access_token': 'new', 'expires_in': 86400})
+
+    cache = TokenCache(store=store)
+    assert cache.get('tenant', 'client_id', fetch)['access_token'] == 'new'
+    assert fetch.call_count == 1
+
+
+def test_get_shared_store_failure():
+    """A broken store falls back to fetching the token directly"""
+    store = Mock()
+    store.get.side_effect = Exception('boom')
+    store.acquire.side_effect = Exception('boom')
+    fetch = Mock(return_value={'access_token': 'token', 'expires_in': 86400})
+
+    cache = TokenCache(store=store)
+    assert cache.get('tenant', 'client_id', fetch)['access_token'] == 'token'
+    assert fetch.call_count == 1
@@ -3,6 +3,9 @@ Unit test globals
 """
 from unittest import mock
 import pytest
+from src.auth0_provider.ratelimit import LIMITERS
+from src.auth0_provider.token import TOKENS
+from src.utils import config, retry, secret
 
 @pytest.fixture(scope='session', autouse=True)
 def default_session_fixture(request):
@@ -17,3 +20,15 @@ def default_session_fixture(request):
         except IndexError:
             pass
     request.addfinalizer(unpatch)
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """reset the module level caches between unit tests"""
+    yield
+    TOKENS.clear()
+    TOKENS.store = None
+    secret.CACHE.clear()
+    config.PROVIDERS.clear()
+    config.STACK_TAGS.clear()
+    LIMITERS.clear()
+    retry.DEADLINE = None
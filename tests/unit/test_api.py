@@ -124,7 +124,11 @@ def test_update(get_provider, case):
     event = {
         'ResourceProperties': case['parameters'],
         'PhysicalResourceId': 'id',
-        'OldResourceProperties': case['parameters'],
+        # every field is new apart from the audience
+        'OldResourceProperties': {
+            'Tenant': case['parameters'].get('Tenant'),
+            'Audience': case['parameters'].get('Audience'),
+        },
     }
 
     with case['expect'].get('error', does_not_raise()):
@@ -134,11 +138,49 @@ def test_update(get_provider, case):
     if 'error' in case['expect']:
         return
 
-    del case['expect']['api']['identifier']
+    expected = {**case['expect']['api']}
+    del expected['identifier']
 
-    provider.update_api.assert_called_with(
-        'id', **case['expect']['api']
-    )
+    if not expected:
+        # nothing but the audience, which didn't change
+        provider.update_api.assert_not_called()
+        return
+    provider.update_api.assert_called_with('id', **expected)
+
+
+API_PROPS = {
+    'Tenant': 'my-tenant.auth0.com',
+    'Name': 'cr-unittest',
+    'Audience': 'https://api.foo.com',
+    'Scopes': ['read:foo'],
+    'TokenLifetime': '3600',
+}
+
+
+@patch('src.api.config.get_provider')
+def test_update_changed_fields(get_provider):
+    """Only changed fields are sent and unchanged apis skip auth0"""
+    helper = MagicMock()
+    helper.Data = {}
+    event = {
+        'ResourceProperties': {**API_PROPS, 'TokenLifetime': 3600, 'ServiceToken': 'new'},
+        'PhysicalResourceId': 'id',
+        'OldResourceProperties': API_PROPS,
+    }
+    assert api.update(event, {}, helper) == 'id'
+    get_provider.assert_not_called()
+    assert helper.Data == {'ApiId': 'id', 'Audience': 'https://api.foo.com'}
+
+    event['ResourceProperties'] = {**API_PROPS, 'Scopes': ['read:foo', 'write:foo']}
+    api.update(event, {}, helper)
+    get_provider.return_value.update_api.assert_called_with(
+        'id', scopes=['read:foo', 'write:foo'])
+
+    # old properties that don't validate send everything
+    event['OldResourceProperties'] = {**API_PROPS, 'TokenLifetime': 'forever'}
+    api.update(event, {}, helper)
+    get_provider.return_value.update_api.assert_called_with(
+        'id', name='cr-unittest', scopes=['read:foo', 'write:foo'], token_lifetime=3600)
 
 
 @patch('src.api.config.get_provider')
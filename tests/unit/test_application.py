@@ -3,6 +3,7 @@ Test the application resource type
 """
 from contextlib import contextmanager
 import json
+import threading
 from unittest.mock import MagicMock, patch, ANY
 import pytest
 
@@ -338,10 +339,8 @@ def test_create(ssm, secrets_client, get_provider, case, monkeypatch):
         **case['expect']['application']
     )
 
-    if 'Connections' in case['parameters']:
-        provider.add_to_connection.assert_called_with(
-            case['parameters']['Connections'][-1], helper.Data['ClientId']
-        )
+    for conn_id in case['parameters'].get('Connections', []):
+        provider.add_to_connection.assert_any_call(conn_id, helper.Data['ClientId'])
 
     if case['parameters']['Type'] == 'm2m':
         secrets_client.create_secret.assert_called_with(
@@ -395,7 +394,11 @@ def test_update(get_muxed_secret, get_provider, case, monkeypatch):
     physical_id = '/qa/auth0/crunittest' if case['parameters']['Type'] == 'm2m' else 'foo-test'
     event = {
         'ResourceProperties': case['parameters'],
-        'OldResourceProperties': case['parameters'],
+        # old properties that no longer validate get the full payload
+        'OldResourceProperties': {
+            'Tenant': case['parameters'].get('Tenant'),
+            'Type': case['parameters'].get('Type'),
+        },
         'PhysicalResourceId': physical_id,
     }
 
@@ -412,16 +415,94 @@ def test_update(get_muxed_secret, get_provider, case, monkeypatch):
     )
 
     if case['parameters']['Type'] == 'm2m':
-        get_muxed_secret.assert_called_with(
-            ANY,
-            '/qa/auth0/crunittest',
-            ANY
-        )
+        get_muxed_secret.assert_called_with(ANY, '/qa/auth0/crunittest')
 
         assert helper.Data['Arn'] == 'arn:aws:secret'
         assert helper.Data['Name'] == '/qa/auth0/crunittest'
 
 
+UPDATE_PROPS = {
+    'Tenant': 'my-tenant.auth0.com',
+    'Name': 'cr-unittest',
+    'Description': 'test',
+    'Type': 'spa',
+    'CallbackUrls': ['https://foo.com'],
+    'Connections': ['conn1'],
+    'AllowAdGroups': ['group1'],
+}
+
+
+@patch('src.application.config.get_provider')
+def test_update_unchanged(get_provider):
+    """An update that changes nothing in auth0 doesn't authenticate"""
+    helper = MagicMock()
+    helper.Data = {'tags': {'AllowAdGroups': ['group1']}}
+    event = {
+        'ResourceProperties': {**UPDATE_PROPS, 'ServiceToken': 'new'},
+        'OldResourceProperties': UPDATE_PROPS,
+        'PhysicalResourceId': 'foo-test',
+    }
+    assert app.update(event, {}, helper) == 'foo-test'
+    get_provider.assert_not_called()
+    assert helper.Data['ClientId'] == 'foo-test'
+
+
+@patch('src.application.config.get_provider')
+def test_update_changed_fields(get_provider):
+    """Only the changed fields are sent"""
+    provider = get_provider.return_value
+    provider.update_application.return_value = 'foo-test'
+    helper = MagicMock()
+    helper.Data = {'tags': {'ApplicationID': 'app'}}
+    event = {
+        'ResourceProperties': {**UPDATE_PROPS, 'Description': 'changed'},
+        'OldResourceProperties': UPDATE_PROPS,
+        'PhysicalResourceId': 'foo-test',
+    }
+    app.update(event, {}, helper)
+    metadata = {'ApplicationID': 'app', 'AllowAdGroups': '["group1"]'}
+    provider.update_application.assert_called_with(
+        'foo-test', description='changed', client_metadata=metadata)
+    provider.add_to_connection.assert_not_called()
+
+    # removing AllowAdGroups clears it from the metadata
+    props = {**UPDATE_PROPS}
+    props.pop('AllowAdGroups')
+    event['ResourceProperties'] = props
+    app.update(event, {}, helper)
+    provider.update_application.assert_called_with(
+        'foo-test', client_metadata={'ApplicationID': 'app', 'AllowAdGroups': None})
+
+    # only the connections changed
+    provider.update_application.reset_mock()
+    helper.Data = {}
+    event['ResourceProperties'] = {**UPDATE_PROPS, 'Connections': ['conn1', 'conn2']}
+    app.update(event, {}, helper)
+    provider.add_to_connection.assert_called_with('conn2', 'foo-test')
+    provider.update_application.assert_not_called()
+
+
+@patch('src.application.config.get_provider')
+def test_update_stack_tag_changed(get_provider):
+    """A new value of a stack tag reaches auth0 even when the properties are the same"""
+    provider = get_provider.return_value
+    helper = MagicMock()
+    helper.Data = {'tags': {'ApplicationID': 'new'}}
+    event = {
+        'ResourceProperties': {**UPDATE_PROPS, 'Name': 'b'},
+        'OldResourceProperties': UPDATE_PROPS,
+        'PhysicalResourceId': 'cid',
+    }
+    app.update(event, {}, helper)
+    provider.update_application.assert_called_with(
+        'cid', name='b', client_metadata={'ApplicationID': 'new', 'AllowAdGroups': '["group1"]'})
+
+    event['ResourceProperties'] = UPDATE_PROPS
+    app.update(event, {}, helper)
+    provider.update_application.assert_called_with(
+        'cid', client_metadata={'ApplicationID': 'new', 'AllowAdGroups': '["group1"]'})
+
+
 def test_manage_connection():
     """Test managing a list of connections"""
     connections = ['conn1', 'conn2']
@@ -434,6 +515,20 @@ def test_manage_connection():
     assert connections == app.manage_connection(connections, app_id, method)
 
 
+def test_manage_connection_concurrent():
+    """Connections are changed concurrently and failures are reported in order"""
+    connections = [f'conn{i}' for i in range(10)]
+    barrier = threading.Barrier(app.CONNECTION_WORKERS, timeout=5)
+
+    def method(conn_id, _):
+        # every worker has to be busy at once for the barrier to open
+        barrier.wait()
+        if conn_id in ('conn3', 'conn7'):
+            raise Exception(conn_id)
+
+    assert ['conn3', 'conn7'] == app.manage_connection(connections, '1234', method)
+
+
 def test_update_connections():
     """test updating connections, one to add, one to remove, one to keep"""
     old = ['a', 'b']
@@ -447,10 +542,30 @@ def test_update_connections():
 
     provider.add_to_connection.side_effect = Exception()
 
-    with pytest.raises(Exception):
+    with pytest.raises(app.ConnectionsFailed, match=r"failed to add: \['c'\]"):
         app.update_connections(old, current, provider, app_id)
 
 
+@patch('src.application.config.get_provider')
+@patch('src.application.ssm')
+def test_create_connection_failed(ssm, get_provider):
+    """test the application is deleted when it can't be added to a connection"""
+    provider = get_provider.return_value
+    provider.create_application.return_value = ('foo', 'bar')
+    provider.add_to_connection.side_effect = Exception('denied')
+    helper = MagicMock()
+    helper.Data = {}
+    event = {'ResourceProperties': {
+        'Tenant': 'foo.com', 'Name': 'app', 'Description': 'app', 'Type': 'spa',
+        'Connections': ['conn1'],
+    }}
+
+    with pytest.raises(app.ConnectionsFailed, match=r"failed to add: \['conn1'\]"):
+        app.create(event, {}, helper)
+    provider.delete_application.assert_called_with('foo')
+    ssm.put_parameter.assert_not_called()
+
+
 @patch('src.application.config.get_provider')
 @patch('src.utils.secret.get_muxed_secret')
 @patch('src.application.secrets_client', MagicMock())
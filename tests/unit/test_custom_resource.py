@@ -108,3 +108,218 @@ def test_stack_is_failing(event):
     """test events to see if stack is failing"""
 
     assert index.stack_is_failing(event) is not event["success"]
+
+
+def test_get_resource():
+    """Resource modules are imported when an event first needs them"""
+    resource = index.get_resource({'ResourceType': 'Custom::Authn_Api'})
+    assert resource.__name__ == 'src.api'
+    with pytest.raises(KeyError):
+        index.get_resource({'ResourceType': 'Custom::Authn_Nope'})
+
+
+STACK_ID = 'arn:aws:cloudformation:us-east-1:123456789012:stack/stack/1'
+
+
+@patch('src.custom_resource.delete')
+@patch('src.custom_resource.cfn')
+def test_poll_create(cfn, delete):
+    """Polls only read new stack events and tear down the resource when the stack fails"""
+    cfn.describe_stack_events.return_value = {'StackEvents': [
+        {'EventId': 'e2', 'LogicalResourceId': 'App', 'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'EventId': 'e1', 'LogicalResourceId': 'stack', 'ResourceStatus': 'CREATE_IN_PROGRESS',
+         'ResourceStatusReason': 'User Initiated'},
+    ]}
+    data = {'PhysicalResourceId': 'abc', index.stack_events.CURSOR: 'e1'}
+    event = {'StackId': STACK_ID, 'RequestId': 'foobar', 'LogicalResourceId': 'App',
+             'CrHelperData': data}
+    index.helper.Data = data
+    assert index.poll_create(event, Mock()) == 'abc'
+    cfn.describe_stack_events.assert_called_once_with(StackName=STACK_ID)
+    delete.assert_not_called()
+    # the cursor isn't returned with the resource's attributes
+    assert data == {'PhysicalResourceId': 'abc'}
+
+    cfn.describe_stack_events.return_value = {'StackEvents': [
+        {'EventId': 'e3', 'LogicalResourceId': 'Grant', 'ResourceStatus': 'CREATE_FAILED'},
+        {'EventId': 'e1', 'LogicalResourceId': 'stack', 'ResourceStatus': 'CREATE_IN_PROGRESS',
+         'ResourceStatusReason': 'User Initiated'},
+    ]}
+    assert index.poll_create(event, Mock()) == 'abc'
+    delete.assert_called_once()
+    assert event['PhysicalResourceId'] == 'abc'
+
+
+@patch('src.utils.polling.MAX_WAIT', 8)
+@patch('src.custom_resource.cfn')
+def test_poll_create_backoff(cfn):
+    """Polls back off while other resources deploy and finish once they are done"""
+    cfn.describe_stack_events.return_value = {'StackEvents': [
+        {'EventId': 'e3', 'LogicalResourceId': 'Bucket', 'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'EventId': 'e2', 'LogicalResourceId': 'App', 'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'EventId': 'e1', 'LogicalResourceId': 'stack', 'ResourceStatus': 'CREATE_IN_PROGRESS',
+         'ResourceStatusReason': 'User Initiated'},
+    ]}
+    data = {'PhysicalResourceId': 'abc'}
+    event = {'StackId': STACK_ID, 'LogicalResourceId': 'App', 'CrHelperData': data,
+             'CrHelperRule': 'arn:aws:events:us-east-1:123456789012:rule/AppRule'}
+    context = Mock()
+    context.function_name = 'function'
+    index.helper.Data = data
+    with patch.object(index.helper, '_events_client') as events, \
+            patch.object(index.helper, '_put_targets') as put_targets:
+        assert index.poll_create(event, context) is None
+        events.put_rule.assert_called_once_with(
+            Name='AppRule', ScheduleExpression='rate(2 minutes)', State='ENABLED')
+        put_targets.assert_called_once_with('function')
+        assert data[index.polling.IN_PROGRESS] == ['Bucket']
+        assert data[index.stack_events.CURSOR] == 'e3'
+
+        cfn.describe_stack_events.return_value = {'StackEvents': [
+            {'EventId': 'e4', 'LogicalResourceId': 'Bucket', 'ResourceStatus': 'CREATE_COMPLETE'},
+        ] + cfn.describe_stack_events.return_value['StackEvents']}
+        assert index.poll_create(event, context) == 'abc'
+    assert data == {'PhysicalResourceId': 'abc'}
+
+
+@patch('src.custom_resource.cfn')
+def test_poll_create_resumes(cfn):
+    """A poll that continues saves its cursor, the next one only reads newer events"""
+    old = [
+        {'EventId': 'e3', 'LogicalResourceId': 'Bucket', 'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'EventId': 'e2', 'LogicalResourceId': 'App', 'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'EventId': 'e1', 'LogicalResourceId': 'stack', 'ResourceStatus': 'CREATE_IN_PROGRESS',
+         'ResourceStatusReason': 'User Initiated'},
+    ]
+    cfn.describe_stack_events.return_value = {'StackEvents': old}
+    data = {'PhysicalResourceId': 'abc'}
+    event = {'StackId': STACK_ID, 'LogicalResourceId': 'App', 'CrHelperData': data,
+             'CrHelperRule': 'arn:aws:events:us-east-1:123456789012:rule/AppRule'}
+    context = Mock()
+    context.function_name = 'function'
+    index.helper.Data = data
+    with patch.object(index.helper, '_events_client'), \
+            patch.object(index.helper, '_put_targets') as put_targets:
+        assert index.poll_create(event, context) is None
+        # the data saved with the rule's target carries the cursor
+        put_targets.assert_called_once_with('function')
+        assert data[index.stack_events.CURSOR] == 'e3'
+
+        cfn.describe_stack_events.reset_mock()
+        cfn.describe_stack_events.side_effect = [
+            {'StackEvents': [
+                {'EventId': 'e4', 'LogicalResourceId': 'Bucket',
+                 'ResourceStatus': 'CREATE_COMPLETE'},
+                old[0],
+            ], 'NextToken': 'page2'},
+            {'StackEvents': old[1:]},
+        ]
+        assert index.poll_create(event, context) == 'abc'
+        # stopped at the cursor on the first page
+        cfn.describe_stack_events.assert_called_once_with(StackName=STACK_ID)
+    assert data == {'PhysicalResourceId': 'abc'}
+
+
+@patch('src.custom_resource.cfn')
+def test_poll_create_served_siblings(cfn):
+    """Two resources of this function polling at the same time don't wait on each other"""
+    cfn.describe_stack_events.return_value = {'StackEvents': [
+        {'EventId': 'e4', 'LogicalResourceId': 'Bucket', 'ResourceType': 'AWS::S3::Bucket',
+         'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'EventId': 'e3', 'LogicalResourceId': 'Grant', 'ResourceType': 'Custom::Authn_Grant',
+         'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'EventId': 'e2', 'LogicalResourceId': 'App', 'ResourceType': 'Custom::Authn_Application',
+         'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'EventId': 'e1', 'LogicalResourceId': 'stack', 'ResourceStatus': 'CREATE_IN_PROGRESS',
+         'ResourceStatusReason': 'User Initiated'},
+    ]}
+    context = Mock()
+    context.function_name = 'function'
+    polls = {}
+    for name in ('App', 'Grant'):
+        data = {'PhysicalResourceId': name.lower()}
+        polls[name] = {'StackId': STACK_ID, 'LogicalResourceId': name, 'CrHelperData': data,
+                       'CrHelperRule': f'arn:aws:events:us-east-1:123456789012:rule/{name}Rule'}
+
+    with patch.object(index.helper, '_events_client'), \
+            patch.object(index.helper, '_put_targets'):
+        for name, event in polls.items():
+            index.helper.Data = event['CrHelperData']
+            assert index.poll_create(event, context) is None
+            assert event['CrHelperData'][index.polling.IN_PROGRESS] == ['Bucket']
+
+        # the bucket is done, both are answered while the other is still in progress
+        cfn.describe_stack_events.return_value = {'StackEvents': [
+            {'EventId': 'e5', 'LogicalResourceId': 'Bucket', 'ResourceType': 'AWS::S3::Bucket',
+             'ResourceStatus': 'CREATE_COMPLETE'},
+        ] + cfn.describe_stack_events.return_value['StackEvents']}
+        for name, event in polls.items():
+            index.helper.Data = event['CrHelperData']
+            assert index.poll_create(event, context) == name.lower()
+            assert event['CrHelperData'] == {'PhysicalResourceId': name.lower()}
+
+
+@patch('src.custom_resource.cfn')
+def test_poll_create_max_wait(cfn):
+    """Creates are answered once they have waited long enough"""
+    cfn.describe_stack_events.return_value = {'StackEvents': [
+        {'EventId': 'e3', 'LogicalResourceId': 'Bucket', 'ResourceStatus': 'CREATE_IN_PROGRESS'},
+    ]}
+    data = {'PhysicalResourceId': 'abc', index.polling.INTERVAL: 1, index.polling.WAITED: 1}
+    event = {'StackId': STACK_ID, 'LogicalResourceId': 'App', 'CrHelperData': data}
+    index.helper.Data = data
+    with patch.object(index.helper, '_put_targets') as put_targets:
+        assert index.poll_create(event, Mock()) == 'abc'
+    put_targets.assert_not_called()
+
+
+@patch('src.custom_resource.helper')
+def test_finish_poll(helper):
+    """Unfinished polls save their data for the next poll"""
+    context = Mock()
+    context.function_name = 'function'
+    helper.Data = {'PhysicalResourceId': 'abc', index.stack_events.CURSOR: 'e1'}
+    assert index.finish_poll(context, 'abc', done=False) is None
+    helper._put_targets.assert_called_once_with('function')  # pylint: disable=protected-access
+    assert helper.Data[index.stack_events.CURSOR] == 'e1'
+
+    # the rule's target input is too large, the create is answered instead of failing
+    helper._put_targets.side_effect = Exception('Input exceeds 8192 characters')  # pylint: disable=protected-access
+    assert index.finish_poll(context, 'abc', done=False) == 'abc'
+    assert helper.Data == {'PhysicalResourceId': 'abc'}
+
+
+@pytest.mark.parametrize('request_type,stack_id,wait', [
+    ('Delete', 'arn:aws:cloudformation:stack/app/1', 0),
+    ('Delete', 'arn:aws:cloudformation:stack/auth0-cr/1', 120),
+    ('Create', 'arn:aws:cloudformation:stack/auth0-cr/1', 0),
+])
+def test_delete_wait(request_type, stack_id, wait, monkeypatch):
+    """Deletes only wait when they come from the stack of the function"""
+    monkeypatch.setenv('FUNCTION_STACK_ID', 'arn:aws:cloudformation:stack/auth0-cr/1')
+    assert index.delete_wait({'RequestType': request_type, 'StackId': stack_id}) == wait
+    monkeypatch.delenv('FUNCTION_STACK_ID')
+    assert index.delete_wait({'RequestType': request_type, 'StackId': stack_id}) == 0
+
+
+@patch('src.custom_resource.CfnResource._send', Mock())
+@patch('src.custom_resource.get_resource', Mock())
+def test_lambda_handler_delete(monkeypatch):
+    """Deletes from other stacks are answered without waiting"""
+    monkeypatch.setenv('FUNCTION_STACK_ID', 'arn:aws:cloudformation:stack/auth0-cr/1')
+    event = {
+        'RequestType': 'Delete',
+        'ResponseURL': 's3::/fake/path',
+        'StackId': 'arn:aws:cloudformation:stack/app/1',
+        'RequestId': 'foobar',
+        'ResourceType': 'Custom::Authn_Api',
+        'LogicalResourceId': 'foo',
+        'PhysicalResourceId': 'bar',
+        'ResourceProperties': {}
+    }
+    context = Mock()
+    context.get_remaining_time_in_millis.return_value = 900000
+    with patch.object(index.helper, '_wait_for_cwlogs') as wait:
+        index.lambda_handler(event, context)
+    wait.assert_called_once()
+    assert index.helper._sleep_on_delete == 0  # pylint: disable=protected-access
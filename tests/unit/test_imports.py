@@ -0,0 +1,23 @@
+"""Modules the lambda handlers load on a cold start"""
+import pytest
+
+from tests.importtime import import_times
+
+# Modules only needed once an event is handled, importing a handler must not load them
+DEFERRED = (
+    'auth0',
+    'cerberus',
+    'stringcase',
+    'src.application',
+    'src.api',
+    'src.grant',
+    'src.validation',
+    'src.auth0_provider.index',
+)
+
+
+@pytest.mark.parametrize('handler', ['src.custom_resource', 'src.rotation'])
+def test_deferred_imports(handler):
+    """Handlers load no resource modules or sdks up front, timings are in tests/benchmark"""
+    eager = [name for name in import_times(handler) if name.startswith(DEFERRED)]
+    assert eager == []
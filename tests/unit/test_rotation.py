@@ -258,6 +258,8 @@ def test_handler_finish(mock_config, mock_finish, mock_secrets):
         {}
     )
     mock_finish.assert_called_with(mock_secrets, ARN, token)
+    mock_secrets.get_secret_value.assert_called_with(SecretId=ARN, VersionStage='AWSCURRENT')
+    mock_config.evict_provider.assert_called_with('mmm-dev')
 
 
 @patch('src.rotation.client')
@@ -301,8 +303,7 @@ def test_create_secret_exists(mock_get_secret):
     client = Mock()
     token = 'token'
     rotation.create_secret(client, provider, ARN, token)
-    mock_get_secret.assert_called_with(
-        client, ARN, rotation.logger)
+    mock_get_secret.assert_called_with(client, ARN)
     provider.rotate_client_secret.assert_called_with(client_id=client_id)
     client.put_secret_value.assert_called_with(
         SecretId=ARN,
@@ -391,3 +392,27 @@ def test_finish_secret_finished():
     rotation.finish_secret(mock_secrets, ARN, token)
     mock_secrets.describe_secret.assert_called_with(SecretId=ARN)
     mock_secrets.update_secret_version_stage.assert_not_called()
+
+
+@patch('src.rotation.secret.invalidate')
+@patch('src.rotation.secret.get_secret')
+def test_rotation_invalidates_cache(mock_get_secret, invalidate):
+    """Test the cached secret is dropped whenever rotation changes it"""
+    mock_get_secret.return_value = json.dumps({
+        'client_id': 'client_id',
+        'client_secret': 'old_secret'
+    })
+    client = Mock()
+    client.describe_secret.return_value = {
+        'VersionIdsToStages': {
+            'ver1': ['AWSCURRENT'],
+            'ver2': ['AWSPENDING']
+        }
+    }
+    provider = Mock()
+    provider.rotate_client_secret.return_value = 'new_secret'
+    rotation.create_secret(client, provider, ARN, 'ver2')
+    invalidate.assert_called_once_with(ARN)
+
+    rotation.finish_secret(client, ARN, 'ver2')
+    assert invalidate.call_count == 2
@@ -0,0 +1,189 @@
+"""Tests for validation/__init__.py"""
+import copy
+import random
+from unittest.mock import patch
+
+import pytest
+
+from src import validation
+from src.validation import api, application, grant
+from src.validation.application import auth0Validator
+
+
+def test_snake_document():
+    """Keys are snake cased at every level and the document is copied"""
+    scopes = ['read', 'write']
+    document = {
+        'JWTConfiguration': {'LifetimeInSeconds': '60', 'Scopes': scopes},
+        'Mobile': [{'IOS': {'TeamId': 'x'}}],
+    }
+    normalized = validation.snake_document(document)
+    assert normalized == {
+        'j_w_t_configuration': {'lifetime_in_seconds': '60', 'scopes': ['read', 'write']},
+        'mobile': [{'i_o_s': {'team_id': 'x'}}],
+    }
+    assert normalized['j_w_t_configuration']['scopes'] is not scopes
+
+
+def test_snake_key_memoised():
+    """Each property name is only converted once"""
+    assert validation.snake_key('CallbackUrls') == 'callback_urls'
+    hits = validation.snake_key.cache_info().hits
+    assert validation.snake_key('CallbackUrls') == 'callback_urls'
+    assert validation.snake_key.cache_info().hits == hits + 1
+
+
+def test_normalize_document_copies():
+    """Validating never changes the event properties"""
+    props = {'Name': 'app', 'Description': 'test', 'Type': 'spa',
+             'JWTConfiguration': {'LifetimeInSeconds': '60'}}
+    auth0Validator.validated(props)
+    assert props['JWTConfiguration'] == {'LifetimeInSeconds': '60'}
+    assert props['Type'] == 'spa'
+
+
+# Values tried for each property by the parity tests, valid and invalid ones
+PARITY_VALUES = {
+    'Tenant': ['my-tenant.auth0.com', ''],
+    'ServiceToken': ['arn:aws:lambda:token'],
+    'Name': ['app', '', 5, None],
+    'Description': ['an application', ''],
+    'Type': ['spa', 'native', 'm2m', 'web', 'bad', ''],
+    'TokenEndpointAuthMethod': ['None', 'Post', 'Basic', 'bad'],
+    'AuthMethod': ['client_secret_post', 5],
+    'LogoUri': ['https://example.com/logo.png', 3],
+    'LoginURI': ['https://example.com/login'],
+    'CallbackUrls': [[], ['https://example.com'], ['https://example.com', 5], 'https://a'],
+    'LogoutUrls': [['https://example.com/logout'], None],
+    'WebOrigins': [['https://example.com'], [None]],
+    'AllowedOrigins': [['https://example.com'], {}],
+    'JWTConfiguration': [
+        {'LifetimeInSeconds': '60'}, {'LifetimeInSeconds': 'x'}, {},
+        {'Alg': 'RS256', 'Scopes': {}}, {'Unknown': 1}, {'Scopes': {'Nested': {'Deep': 1}}},
+        'string',
+    ],
+    'RefreshToken': [
+        {'RotationType': 'rotating', 'ExpirationType': 'expiring', 'TokenLifetime': '1800'},
+        {'TokenLifetime': '10'}, {'RotationType': 'bad'}, {'TokenLifetime': 'x'},
+    ],
+    'NativeSocialLogin': [{'Apple': {'Enabled': True}}, {'Facebook': 'x'}],
+    'ClientMetadata': [{'Foo': 'bar'}, {'Deep': {'Nested': [1, {'List': 2}]}}, 'x'],
+    'Mobile': [
+        {'Android': {'AppPackageName': 'a', 'Sha256CertFingerprints': ['x']}},
+        {'Ios': {'TeamId': 't', 'AppBundleIdentifier': 'b'}},
+        {'Ios': {'TeamId': 5}}, {'Other': {}},
+    ],
+    'AllowedClients': [['client'], 'client'],
+    'OidcConformant': ['true', 'false', True, 'yes', 1],
+    'GrantTypes': [
+        ['client_credentials'], ['implicit', 'authorization_code'], ['bad'], [], 'implicit'],
+    'AllowAdGroups': [['group'], 'group'],
+    'Connections': [['con_1'], 'con_1'],
+    'Audience': ['https://example.com/api', '', 5],
+    'Scopes': [['read:thing'], 'read:thing', [5]],
+    'SigningAlg': ['RS256', 'HS512'],
+    'SigningSecret': ['secret'],
+    'AllowOfflineAccess': ['true', 'no'],
+    'TokenLifetime': ['3600', 'x', 60],
+    'TokenDialect': ['access_token', 'jwt'],
+    'SkipConsentForVerifiableFirstPartyClients': ['false'],
+    'EnforcePolicies': ['true', None],
+    'ApplicationId': ['client', ''],
+    'Scope': [['read:thing'], 'read:thing'],
+    'Unknown': ['x', {'Nested': 1}],
+}
+PARITY_VALIDATORS = {
+    'application': application.auth0Validator,
+    'api': api.auth0Validator,
+    'grant': grant.auth0Validator,
+}
+PARITY_PROPERTIES = {
+    'application': ['Name', 'Description', 'Type'],
+    'api': ['Audience'],
+    'grant': ['ApplicationId', 'Audience'],
+}
+PARITY_DOCUMENTS = 400
+
+
+def parity_documents(kind, seed):
+    """Random documents mixing valid and invalid values, mostly with the required fields"""
+    rand = random.Random(seed)
+    schema = PARITY_VALIDATORS[kind].schema
+    optional = sorted(name for name in PARITY_VALUES if validation.snake_key(name) in schema)
+    documents = []
+    for _ in range(PARITY_DOCUMENTS):
+        document = {
+            name: rand.choice(PARITY_VALUES[name][:2])
+            for name in PARITY_PROPERTIES[kind] if rand.random() < 0.95
+        }
+        for name in rand.sample(optional, rand.randint(0, min(6, len(optional)))):
+            # mostly the first, valid, value
+            values = PARITY_VALUES[name]
+            document[name] = values[0] if rand.random() < 0.7 else rand.choice(values)
+        if rand.random() < 0.05:
+            document['Unknown'] = rand.choice(PARITY_VALUES['Unknown'])
+        documents.append(document)
+    return documents
+
+
+def outcome(validate, document):
+    """
+    Validate a copy of document. Some invalid documents make cerberus raise,
+    unknown nested documents during coercion and failed coercions after a rename.
+    """
+    try:
+        return validate(copy.deepcopy(document))
+    except (KeyError, TypeError) as err:
+        return repr(err)
+
+
+@pytest.mark.parametrize('kind', sorted(PARITY_VALIDATORS))
+def test_compiled_schemas(kind):
+    """Every resource schema is compiled"""
+    assert PARITY_VALIDATORS[kind].compiled is not None
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('kind', sorted(PARITY_VALIDATORS))
+def test_compiled_parity(kind, seed):
+    """The compiled fast path returns what cerberus does, with the same errors"""
+    validator = PARITY_VALIDATORS[kind]
+    accepted = 0
+    for document in parity_documents(kind, seed):
+        expected = outcome(validator.cerberus_validated, document)
+        errors = validator.errors
+        assert outcome(validator.validated, document) == expected, document
+        if not isinstance(expected, str):
+            assert validator.errors == errors, document
+        accepted += isinstance(expected, dict)
+    # both valid and invalid documents were compared
+    assert 0 < accepted < PARITY_DOCUMENTS
+
+
+@pytest.mark.parametrize('kind', sorted(PARITY_VALIDATORS))
+def test_compiled_fast_path(kind):
+    """Valid documents don't fall back to cerberus"""
+    validator = PARITY_VALIDATORS[kind]
+    for document in parity_documents(kind, 0):
+        if isinstance(outcome(validator.cerberus_validated, document), dict):
+            with patch.object(validator, 'cerberus_validated') as cerberus:
+                validator.validated(document)
+            cerberus.assert_not_called()
+
+
+def test_compiled_disabled():
+    """COMPILED_VALIDATION=false always validates with cerberus"""
+    props = {'Name': 'app', 'Description': 'test', 'Type': 'spa'}
+    with patch.object(validation, 'COMPILED_VALIDATION', False), \
+            patch.object(auth0Validator, 'compiled') as compiled:
+        assert auth0Validator.validated(props)['app_type'] == 'spa'
+    compiled.validated.assert_not_called()
+
+
+def test_cerberus_schema_not_nested():
+    """Repeated validations keep using the validator's own schema"""
+    props = {'Audience': 'https://example.com/api', 'Scopes': ['read:thing']}
+    schema = api.auth0Validator.schema
+    for _ in range(3):
+        assert api.auth0Validator.cerberus_validated(props)['identifier'] == props['Audience']
+    assert api.auth0Validator.schema is schema
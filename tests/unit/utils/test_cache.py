@@ -0,0 +1,58 @@
+"""Tests for utils/cache"""
+from unittest.mock import patch, MagicMock as Mock
+from src.utils.cache import TTLCache
+
+
+def test_lru_eviction():
+    """The least recently used entry is evicted when the cache is full"""
+    cache = TTLCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+
+@patch('src.utils.cache.time')
+def test_ttl_expiry(mock_time):
+    """Entries expire after ttl seconds"""
+    mock_time.time.return_value = 0
+    cache = TTLCache(ttl=10)
+    cache.put('a', 1)
+    mock_time.time.return_value = 9
+    assert cache.get('a') == 1
+    mock_time.time.return_value = 10
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+    # entries can expire sooner than the rest of the cache
+    cache.put('a', 1, ttl=2)
+    cache.get_or_load('b', lambda: 2, ttl=2)
+    mock_time.time.return_value = 12
+    assert cache.get('a') is None
+    assert cache.get('b') is None
+
+
+def test_get_or_load():
+    """Misses are loaded once and counted"""
+    cache = TTLCache()
+    load = Mock(return_value='value')
+    assert cache.get_or_load('a', load) == 'value'
+    assert cache.get_or_load('a', load) == 'value'
+    assert load.call_count == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_invalidate():
+    """Entries can be removed one at a time or by matching the key"""
+    cache = TTLCache()
+    cache.put(('a', 1), 1)
+    cache.put(('a', 2), 2)
+    cache.put(('b', 1), 3)
+    assert cache.pop(('b', 1)) == 3
+    assert cache.pop(('b', 1), 'gone') == 'gone'
+    cache.invalidate(lambda key: key[0] == 'a')
+    assert len(cache) == 0
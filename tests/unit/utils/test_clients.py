@@ -0,0 +1,26 @@
+"""Tests for utils/clients.py"""
+from unittest.mock import patch, MagicMock as Mock
+from src.utils import clients
+
+
+@patch.dict('src.utils.clients.CLIENTS', clear=True)
+@patch('src.utils.clients.boto3')
+def test_get_client(boto3):
+    """Each service client is created once"""
+    boto3.client.side_effect = lambda service: Mock(name=service)
+    ssm = clients.get_client('ssm')
+    assert clients.get_client('ssm') is ssm
+    assert clients.get_client('cloudformation') is not ssm
+    assert boto3.client.call_count == 2
+
+
+@patch.dict('src.utils.clients.CLIENTS', clear=True)
+@patch('src.utils.clients.boto3')
+def test_lazy_client(boto3):
+    """The client is only created when it is first used"""
+    lazy = clients.LazyClient('secretsmanager')
+    boto3.client.assert_not_called()
+    lazy.get_secret_value(SecretId='foo')
+    boto3.client.assert_called_once_with('secretsmanager')
+    boto3.client().get_secret_value.assert_called_with(SecretId='foo')
+    assert lazy.exceptions is boto3.client().exceptions
@@ -1,6 +1,11 @@
 """Tests for utils/config"""
 from unittest.mock import patch, MagicMock
-from src.utils import config
+import pytest
+from botocore.exceptions import ClientError
+from src.auth0_provider.index import Auth0Provider
+from src.auth0_provider.store import MemoryTokenStore
+from src.auth0_provider.token import TOKENS
+from src.utils import config, constants
 from src.validation.application import tagsValidator
 
 @patch('src.utils.config.PROVIDER')
@@ -38,6 +43,7 @@ def test_set_tags(cfn):
         ],
     }
     helper.Data = {}
+    config.STACK_TAGS.clear()
     config.set_tags(helper, event)
     assert helper.Data['tags'] == {'foo': 'bar'}
     assert helper.Data['stack_tags'] == [{'Key': 'foo', 'Value': 'bar'}]
@@ -52,3 +58,141 @@ def test_set_tags(cfn):
 
     validated = tagsValidator.validated(helper.Data['tags'])
     assert validated == {'AllowAdGroups': '["baz"]'}
+
+@patch('src.utils.config.cfn')
+def test_set_tags_cached(cfn):
+    """Stack tags are read once per stack and copied for every resource"""
+    cfn.describe_stacks.return_value = {'Stacks': [{'Tags': [{'Key': 'foo', 'Value': 'bar'}]}]}
+    helper = MagicMock()
+    helper.StackId = 'arn:aws:cloudformation:us-east-1:123456789012:stack/a/1'
+    for _ in range(3):
+        helper.Data = {}
+        config.set_tags(helper)
+        assert helper.Data['tags'] == {'foo': 'bar'}
+    helper.Data['stack_tags'][0]['Value'] = 'changed'
+    cfn.describe_stacks.assert_called_once_with(StackName=helper.StackId)
+
+    helper.StackId = 'arn:aws:cloudformation:us-east-1:123456789012:stack/b/1'
+    config.set_tags(helper)
+    assert helper.Data['stack_tags'] == [{'Key': 'foo', 'Value': 'bar'}]
+    assert cfn.describe_stacks.call_count == 2
+
+    config.STACK_TAGS.clear()
+    config.set_tags(helper)
+    assert cfn.describe_stacks.call_count == 3
+
+@patch('src.utils.config.CFN_RETRY', config.RetryPolicy(base=0, cap=0))
+@patch('src.utils.config.cfn')
+def test_set_tags_throttled(cfn):
+    """describe_stacks is retried when throttled and other errors are raised"""
+    throttled = ClientError(
+        {'Error': {'Code': 'Throttling', 'Message': 'Rate exceeded'}}, 'DescribeStacks')
+    cfn.describe_stacks.side_effect = [
+        throttled, throttled, {'Stacks': [{'Tags': [{'Key': 'foo', 'Value': 'bar'}]}]}]
+    helper = MagicMock()
+    helper.Data = {}
+    config.set_tags(helper)
+    assert helper.Data['tags'] == {'foo': 'bar'}
+    assert cfn.describe_stacks.call_count == 3
+
+    config.STACK_TAGS.clear()
+    cfn.describe_stacks.side_effect = ClientError(
+        {'Error': {'Code': 'ValidationError', 'Message': 'Stack does not exist'}},
+        'DescribeStacks')
+    with pytest.raises(ClientError):
+        config.set_tags(helper)
+    assert cfn.describe_stacks.call_count == 4
+
+def test_get_token_store(monkeypatch):
+    """Test the shared token store is picked by environment variable"""
+    monkeypatch.delenv('TOKEN_STORE', raising=False)
+    assert config.get_token_store() is None
+
+    monkeypatch.setenv('TOKEN_STORE', 'memory')
+    assert isinstance(config.get_token_store(), MemoryTokenStore)
+
+    monkeypatch.setenv('TOKEN_STORE', 'redis')
+    with pytest.raises(KeyError):
+        config.get_token_store()
+
+@patch('src.utils.config.PROVIDER', MagicMock())
+def test_get_provider_token_store(monkeypatch):
+    """Test get_provider sets up the shared token store once"""
+    monkeypatch.setenv('TOKEN_STORE', 'memory')
+    config.get_provider('my-tenant.auth0.com')
+    store = TOKENS.store
+    assert isinstance(store, MemoryTokenStore)
+    config.get_provider('my-tenant.auth0.com')
+    assert TOKENS.store is store
+
+@patch('src.utils.config.PROVIDER')
+def test_get_provider_pooled(provider):
+    """Test providers are reused per tenant and refreshed when the token expires"""
+    provider.side_effect = lambda *_: MagicMock()
+    first = config.get_provider('my-tenant.auth0.com')
+    assert config.get_provider('my-tenant.auth0.com') is first
+    assert config.get_provider('other-tenant.auth0.com') is not first
+    assert provider.call_count == 2
+    first.refresh.assert_not_called()
+
+    first.is_authenticated.return_value = False
+    assert config.get_provider('my-tenant.auth0.com') is first
+    first.refresh.assert_called_once()
+
+@patch('src.utils.config.PROVIDERS', config.TTLCache(max_entries=2))
+@patch('src.utils.config.PROVIDER')
+def test_get_provider_lru(provider):
+    """Test the least recently used tenant is evicted from the pool"""
+    provider.side_effect = lambda *_: MagicMock()
+    tenant_a = config.get_provider('a.auth0.com')
+    config.get_provider('b.auth0.com')
+    config.get_provider('a.auth0.com')
+    config.get_provider('c.auth0.com')
+    assert config.get_provider('a.auth0.com') is tenant_a
+    assert provider.call_count == 3
+    config.get_provider('b.auth0.com')
+    assert provider.call_count == 4
+
+@patch('src.utils.config.secret')
+@patch('src.utils.config.TOKENS')
+@patch('src.utils.config.PROVIDER')
+def test_evict_provider(provider, tokens, secret, monkeypatch):
+    """Test evicting a tenant drops its provider, token and management secret"""
+    monkeypatch.setenv('ENVIRON', 'qa')
+    provider.side_effect = lambda *_: MagicMock()
+    first = config.get_provider('my-tenant.auth0.com')
+    config.evict_provider('my-tenant.auth0.com')
+    tokens.invalidate.assert_called_with('my-tenant.auth0.com')
+    secret.invalidate.assert_called_with(
+        f'{config.MANAGEMENT_PREFIX}qa/auth0/tenant/my-tenant')
+    assert config.get_provider('my-tenant.auth0.com') is not first
+
+    config.evict_provider()
+    tokens.invalidate.assert_called_with(None)
+    assert len(config.PROVIDERS) == 0
+
+
+@patch('src.utils.config.secret')
+@patch('src.utils.config.TOKENS')
+@patch('src.utils.config.PROVIDER')
+def test_reauthorize(provider, tokens, secret, monkeypatch):
+    """Test a provider whose token was rejected authenticates again with fresh credentials"""
+    monkeypatch.setenv('ENVIRON', 'qa')
+    provider.side_effect = lambda *_: MagicMock(tenant='my-tenant.auth0.com')
+    first = config.get_provider('my-tenant.auth0.com')
+    assert first.on_unauthorized is config.reauthorize
+
+    first.token = {'access_token': 'new'}
+    assert config.reauthorize(first, 'old') == 'new'
+    tokens.reject.assert_called_with('my-tenant.auth0.com', 'old')
+    secret.invalidate.assert_called_with(
+        f'{config.MANAGEMENT_PREFIX}qa/auth0/tenant/my-tenant')
+    first.refresh.assert_called_once()
+    assert config.get_provider('my-tenant.auth0.com') is first
+
+
+def test_provider_loaded_lazily():
+    """The provider class is resolved from the constants on first use"""
+    assert constants.PROVIDER is Auth0Provider
+    with pytest.raises(AttributeError):
+        constants.NOT_A_CONSTANT  # pylint: disable=pointless-statement
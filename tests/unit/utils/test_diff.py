@@ -0,0 +1,23 @@
+"""Tests for utils/diff.py"""
+from src.utils import diff
+
+
+def test_changed_fields():
+    """Only new and changed fields are kept"""
+    old = {'name': 'foo', 'callbacks': ['a'], 'jwt_configuration': {'alg': 'RS256'}}
+    new = {'name': 'foo', 'callbacks': ['a', 'b'], 'jwt_configuration': {'alg': 'RS256'},
+           'logo_uri': 'x'}
+    assert diff.changed_fields(old, new) == {'callbacks': ['a', 'b'], 'logo_uri': 'x'}
+    assert diff.changed_fields(new, new) == {}
+    assert diff.changed_fields(new, {}) == {}
+
+
+def test_tenant_changed():
+    """Moving a resource to another tenant counts as a change"""
+    event = {
+        'OldResourceProperties': {'Tenant': 'a.auth0.com'},
+        'ResourceProperties': {'Tenant': 'a.auth0.com'},
+    }
+    assert not diff.tenant_changed(event)
+    event['ResourceProperties']['Tenant'] = 'b.auth0.com'
+    assert diff.tenant_changed(event)
@@ -0,0 +1,87 @@
+"""Tests for utils/polling"""
+from unittest.mock import patch
+
+from src.utils import polling, stack_events
+
+
+def intervals():
+    """Every interval of a create that waits as long as it can"""
+    data = {}
+    scheduled = []
+    while True:
+        interval = polling.schedule(data)
+        if interval is None:
+            break
+        scheduled.append(interval)
+    assert data[polling.WAITED] == polling.MAX_WAIT
+    return scheduled
+
+
+def test_schedule():
+    """By default a create waits two minutes, at most two polls"""
+    assert intervals() == [1]
+
+
+@patch('src.utils.polling.MAX_WAIT', 8)
+def test_schedule_longer():
+    """The interval doubles up to the largest one until the create waited long enough"""
+    assert intervals() == [2, 4, 1]
+
+
+def test_is_served():
+    """Only the resource types of this function are served by it"""
+    assert polling.is_served('Custom::Authn_Application')
+    assert polling.is_served('Custom::Authn_Grant')
+    assert not polling.is_served('Custom::Other')
+    assert not polling.is_served('AWS::S3::Bucket')
+    assert not polling.is_served(None)
+
+
+def test_siblings_in_progress_served():
+    """Other resources of this function polling at the same time are not waited on"""
+    data = {}
+    state = stack_events.analyse([
+        {'LogicalResourceId': 'Bucket', 'ResourceType': 'AWS::S3::Bucket',
+         'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'LogicalResourceId': 'Grant', 'ResourceType': 'Custom::Authn_Grant',
+         'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'LogicalResourceId': 'App', 'ResourceType': 'Custom::Authn_Application',
+         'ResourceStatus': 'CREATE_IN_PROGRESS'},
+    ])
+    assert polling.siblings_in_progress(data, state, ['App']) == ['Bucket']
+    assert polling.siblings_in_progress({}, state, ['Grant']) == ['Bucket']
+
+
+def test_siblings_in_progress():
+    """Resources in progress are remembered between polls"""
+    data = {}
+    state = stack_events.analyse([
+        {'LogicalResourceId': 'Bucket', 'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'LogicalResourceId': 'Queue', 'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'LogicalResourceId': 'App', 'ResourceStatus': 'CREATE_IN_PROGRESS'},
+    ])
+    assert polling.siblings_in_progress(data, state, ['App']) == ['Bucket', 'Queue']
+
+    state = stack_events.analyse([
+        {'LogicalResourceId': 'Queue', 'ResourceStatus': 'CREATE_COMPLETE'},
+    ])
+    assert polling.siblings_in_progress(data, state, ['App']) == ['Bucket']
+    assert data[polling.IN_PROGRESS] == ['Bucket']
+
+
+@patch('src.utils.polling.MAX_TRACKED', 10)
+def test_siblings_in_progress_untracked():
+    """Too many resources in progress make the next poll read the whole deploy"""
+    data = {stack_events.CURSOR: 'e1'}
+    state = stack_events.analyse([
+        {'LogicalResourceId': 'Bucket', 'ResourceStatus': 'CREATE_IN_PROGRESS'},
+        {'LogicalResourceId': 'Queue', 'ResourceStatus': 'CREATE_IN_PROGRESS'},
+    ])
+    assert polling.siblings_in_progress(data, state, []) == ['Bucket', 'Queue']
+    assert not data
+
+
+def test_rate():
+    """Schedule expressions of intervals"""
+    assert polling.rate(1) == 'rate(1 minute)'
+    assert polling.rate(4) == 'rate(4 minutes)'
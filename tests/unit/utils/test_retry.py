@@ -0,0 +1,77 @@
+"""Tests for utils/retry"""
+import time
+from unittest.mock import patch, MagicMock as Mock
+import pytest
+from src.utils import retry
+from src.utils.retry import RetryPolicy
+
+
+def retry_errors(_, error):
+    """retry every error right away"""
+    return None if error is None else 0
+
+
+@patch('src.utils.retry.time.sleep')
+def test_call_retries_until_success(sleep):
+    """A failing call is retried with backoff until it succeeds"""
+    policy = RetryPolicy(max_attempts=4, base=0.1, cap=5)
+    func = Mock(side_effect=[Exception('one'), Exception('two'), 'ok'])
+    assert policy.call(func, retry_errors) == 'ok'
+    assert func.call_count == 3
+    assert sleep.call_count == 2
+    assert policy.retries == 2
+    for call in sleep.call_args_list:
+        assert 0.1 <= call[0][0] <= 5
+
+
+@patch('src.utils.retry.time.sleep', Mock())
+def test_call_gives_up():
+    """The last error is raised once the attempts are used up"""
+    policy = RetryPolicy(max_attempts=3)
+    func = Mock(side_effect=Exception('boom'))
+    with pytest.raises(Exception, match='boom'):
+        policy.call(func, retry_errors)
+    assert func.call_count == 3
+
+
+@patch('src.utils.retry.time.sleep', Mock())
+def test_call_final_outcome():
+    """Outcomes that are not retryable are returned or raised right away"""
+    policy = RetryPolicy()
+    func = Mock(return_value='result')
+    assert policy.call(func, lambda result, error: None) == 'result'
+    func.side_effect = ValueError()
+    with pytest.raises(ValueError):
+        policy.call(func, lambda result, error: None)
+    assert func.call_count == 2
+
+
+@patch('src.utils.retry.time.sleep')
+def test_call_honours_wait_hint(sleep):
+    """The wait asked for by retry_after is a lower bound"""
+    policy = RetryPolicy(max_elapsed=60)
+    func = Mock(side_effect=['limited', 'ok'])
+    policy.call(func, lambda result, error: 7 if result == 'limited' else None)
+    assert sleep.call_args[0][0] >= 7
+
+
+@patch('src.utils.retry.time.sleep', Mock())
+def test_call_bounded_by_elapsed_time():
+    """No retry is started when it would run past max_elapsed"""
+    policy = RetryPolicy(max_attempts=10, max_elapsed=5)
+    func = Mock(side_effect=['limited', 'ok'])
+    assert policy.call(func, lambda result, error: 30 if result == 'limited' else None) == 'limited'
+
+
+def test_set_deadline():
+    """The deadline follows the remaining time of the invocation"""
+    context = Mock()
+    context.get_remaining_time_in_millis.return_value = 20000
+    retry.set_deadline(context)
+    policy = RetryPolicy(max_elapsed=60)
+    start = time.time()
+    assert policy.can_wait(start, 10)
+    assert not policy.can_wait(start, 20 - retry.DEADLINE_BUFFER)
+
+    retry.set_deadline({})
+    assert retry.DEADLINE is None
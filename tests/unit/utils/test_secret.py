@@ -1,7 +1,7 @@
 """Tests for utils/secret"""
 
 import base64
-from unittest.mock import MagicMock as Mock
+from unittest.mock import patch, MagicMock as Mock
 from botocore.exceptions import ClientError
 
 from src.utils import secret
@@ -23,6 +23,8 @@ def test_get_secret():
         SecretId=secret_id, VersionStage='AWSPENDING'
     )
 
+    # the value is cached until the secret is invalidated
+    secret.invalidate(secret_id)
     expected = b'{"example":"value"}'
     client.get_secret_value = Mock(
         return_value={'SecretBinary': base64.b64encode(
@@ -47,15 +49,61 @@ def test_get_secret_error():
         ClientError({'Error': {'Code': 'UnknownException'}}, 'get'),
     ]
     client = Mock()
-    logger = Mock()
     secret_id = 'arn:aws:secretsmanager:secret/id'
 
     for case in cases:
         thrown = False
         client.get_secret_value = Mock(side_effect=case)
         try:
-            secret.get_secret(client, secret_id, logger)
+            secret.get_secret(client, secret_id)
         except ClientError as exc:
             thrown = True
             assert case == exc
         assert thrown
+
+
+def test_get_secret_cached():
+    """Test AWSCURRENT reads are cached per secret id, other stages never are"""
+    client = Mock()
+    client.get_secret_value = Mock(
+        return_value={'SecretString': '{"example":"value"}'})
+    secret_id = 'arn:aws:secretsmanager:secret/id'
+
+    for _ in range(3):
+        assert secret.get_secret(client, secret_id) == '{"example":"value"}'
+    assert client.get_secret_value.call_count == 1
+    client.get_secret_value.assert_called_with(SecretId=secret_id, VersionStage='AWSCURRENT')
+
+    # a retried rotation reads the pending value it just wrote
+    secret.get_secret(client, secret_id, stage='AWSPENDING')
+    secret.get_secret(client, secret_id, stage='AWSPENDING')
+    assert client.get_secret_value.call_count == 3
+    client.get_secret_value.assert_called_with(SecretId=secret_id, VersionStage='AWSPENDING')
+
+    # callers can not change what is cached
+    secret.get_muxed_secret(client, secret_id)['SecretValue'] = 'changed'
+    assert secret.get_secret(client, secret_id) == '{"example":"value"}'
+
+    secret.invalidate(secret_id)
+    secret.get_secret(client, secret_id)
+    assert client.get_secret_value.call_count == 4
+
+
+@patch('src.utils.cache.time')
+def test_get_secret_current_expiry(mock_time):
+    """Test AWSCURRENT is only cached for CURRENT_TTL seconds"""
+    mock_time.time.return_value = 0
+    client = Mock()
+    client.get_secret_value = Mock(
+        return_value={'SecretString': '{"example":"value"}'})
+    secret_id = 'arn:aws:secretsmanager:secret/id'
+
+    secret.get_secret(client, secret_id)
+    mock_time.time.return_value = secret.CURRENT_TTL - 1
+    secret.get_secret(client, secret_id)
+    assert client.get_secret_value.call_count == 1
+
+    # another container moved AWSCURRENT, the old value is dropped soon after
+    mock_time.time.return_value = secret.CURRENT_TTL
+    secret.get_secret(client, secret_id)
+    assert client.get_secret_value.call_count == 2
@@ -0,0 +1,147 @@
+"""Tests for utils/stack_events"""
+from unittest.mock import MagicMock as Mock
+import pytest
+
+from src.utils import stack_events
+
+STACK_ID = 'arn:aws:cloudformation:us-east-1:123456789012:stack/bench/1'
+
+
+def make_event(event_id, status='CREATE_IN_PROGRESS', reason=None):
+    """A stack event"""
+    event = {'EventId': event_id, 'ResourceStatus': status, 'LogicalResourceId': event_id}
+    if reason:
+        event['ResourceStatusReason'] = reason
+    return event
+
+
+def paged_client(events, per_page=2):
+    """A cloudformation client serving events newest first, per_page at a time"""
+    def describe_stack_events(StackName, NextToken=None):  # pylint: disable=invalid-name
+        assert StackName == STACK_ID
+        start = int(NextToken or 0)
+        page = {'StackEvents': events[start:start + per_page]}
+        if start + per_page < len(events):
+            page['NextToken'] = str(start + per_page)
+        return page
+    client = Mock()
+    client.describe_stack_events.side_effect = describe_stack_events
+    return client
+
+
+# newest first: the current deploy, then an earlier one
+HISTORY = [
+    make_event('e6'),
+    make_event('e5'),
+    make_event('e4'),
+    make_event('e3', 'UPDATE_IN_PROGRESS', stack_events.DEPLOY_START),
+    make_event('e2', 'CREATE_COMPLETE'),
+    make_event('e1', 'CREATE_IN_PROGRESS', stack_events.DEPLOY_START),
+]
+
+
+def test_scan_stops_at_deploy_start():
+    """Only the current deploy is read, newest first"""
+    client = paged_client(HISTORY)
+    events = stack_events.scan(client, STACK_ID)
+    assert [event['EventId'] for event in events] == ['e6', 'e5', 'e4', 'e3']
+    assert client.describe_stack_events.call_count == 2
+
+
+def test_scan_stops_at_last_event():
+    """Events read by an earlier scan aren't read again"""
+    client = paged_client(HISTORY)
+    assert [event['EventId'] for event in stack_events.scan(client, STACK_ID, 'e5')] == ['e6']
+    assert client.describe_stack_events.call_count == 1
+    assert not stack_events.scan(client, STACK_ID, 'e6')
+
+
+def test_scan_all_pages():
+    """A stack without a deploy start is read to its first event"""
+    client = paged_client(HISTORY[:3])
+    assert len(stack_events.scan(client, STACK_ID)) == 3
+    assert client.describe_stack_events.call_count == 2
+
+
+def test_scan_new():
+    """The cursor in the poll data moves on to the newest event"""
+    data = {'PhysicalResourceId': 'abc'}
+    events = stack_events.scan_new(paged_client(HISTORY[2:]), STACK_ID, data)
+    assert [event['EventId'] for event in events] == ['e4', 'e3']
+    assert data[stack_events.CURSOR] == 'e4'
+
+    events = stack_events.scan_new(paged_client(HISTORY), STACK_ID, data)
+    assert [event['EventId'] for event in events] == ['e6', 'e5']
+    assert data[stack_events.CURSOR] == 'e6'
+
+    assert not stack_events.scan_new(paged_client(HISTORY), STACK_ID, data)
+    assert data[stack_events.CURSOR] == 'e6'
+
+
+def stack_event(event_id, status, reason=None):
+    """An event of the stack itself"""
+    event = make_event(event_id, status, reason)
+    event.update({'LogicalResourceId': 'bench', 'StackId': STACK_ID,
+                  'PhysicalResourceId': STACK_ID})
+    return event
+
+
+@pytest.mark.parametrize('status', sorted(stack_events.FAILURE_STATUSES))
+def test_analyse_failures(status):
+    """Every failure and rollback status fails the deploy, wherever it happens"""
+    events = [make_event('e3'), make_event('e2', status), HISTORY[3], make_event('e0', status)]
+    state = stack_events.analyse(events)
+    assert state.failing
+    assert state.failures == [events[1]]
+    # the outcome is known at the failure
+    assert state.read == 2
+
+
+def test_analyse_nested_stack():
+    """A nested stack rolling back fails the deploy"""
+    nested = make_event('e2', 'UPDATE_ROLLBACK_IN_PROGRESS')
+    nested.update({'ResourceType': 'AWS::CloudFormation::Stack', 'PhysicalResourceId': 'nested'})
+    assert stack_events.analyse([make_event('e3'), nested, HISTORY[3]]).failing
+
+
+def test_analyse_deploy_start():
+    """Failures of earlier deploys don't count and reading stops at the deploy start"""
+    events = HISTORY[:4] + [make_event('e2', 'CREATE_FAILED')]
+    state = stack_events.analyse(events)
+    assert not state.failing
+    assert state.outcome is None
+    assert state.read == 4
+
+
+def test_analyse_succeeded():
+    """A stack that completed the deploy stops the analysis"""
+    events = [stack_event('e7', 'UPDATE_COMPLETE')] + HISTORY
+    state = stack_events.analyse(events)
+    assert state.outcome == stack_events.SUCCEEDED
+    assert not state.failing
+    assert state.read == 1
+    # a nested stack completing doesn't
+    nested = make_event('e7', 'UPDATE_COMPLETE')
+    nested['StackId'] = STACK_ID
+    assert stack_events.analyse([nested] + HISTORY).outcome is None
+    assert stack_events.analyse([make_event('e7', 'CREATE_COMPLETE')] + HISTORY).outcome is None
+
+
+def test_analyse_complete():
+    """The whole deploy is indexed by resource and status when asked"""
+    events = [
+        make_event('App', 'CREATE_COMPLETE'),
+        make_event('Grant', 'CREATE_FAILED'),
+        make_event('Api', 'CREATE_IN_PROGRESS'),
+        make_event('App', 'CREATE_IN_PROGRESS'),
+        stack_event('e0', 'CREATE_IN_PROGRESS', stack_events.DEPLOY_START),
+    ]
+    state = stack_events.analyse(events, complete=True)
+    assert state.failing
+    assert state.read == 5
+    assert state.resources == {
+        'App': 'CREATE_COMPLETE', 'Grant': 'CREATE_FAILED',
+        'Api': 'CREATE_IN_PROGRESS', 'bench': 'CREATE_IN_PROGRESS',
+    }
+    assert state.statuses()['CREATE_IN_PROGRESS'] == ['Api', 'bench']
+    assert state.in_progress() == ['Api', 'bench']